@@ -0,0 +1,389 @@
+#!/usr/bin/env python3
+import asyncio
+import collections
+import json
+import os
+import random
+import signal
+import socket
+import struct
+import sys
+import time
+
+# Local DNS stub used when settings.json has "block_backend": "dns".
+# hosts_manager.py writes the block state to STATE_FILE and sends SIGHUP;
+# blocked names are answered from memory, everything else is forwarded
+# upstream and cached. Point /etc/resolv.conf at LISTEN_ADDR to use it.
+
+LISTEN_ADDR = "127.0.0.1"
+LISTEN_PORT = 53
+STATE_DIR = "/run/hyprfocus"
+STATE_FILE = os.path.join(STATE_DIR, "dns_state.json")
+PID_FILE = os.path.join(STATE_DIR, "dns_sinkhole.pid")
+
+# Determine Home Directory (Sudo-aware)
+if os.getuid() == 0 and os.getenv("SUDO_USER"):
+    home_dir = os.path.expanduser(f"~{os.getenv('SUDO_USER')}")
+else:
+    home_dir = os.path.expanduser("~")
+
+SETTINGS_FILE = os.path.join(home_dir, ".config/hypr/settings.json")
+
+# systemd-resolved's stub keeps working as the upstream
+DEFAULT_UPSTREAM = "127.0.0.53"
+UPSTREAM_TIMEOUT = 2.0
+
+REDIRECT_IP = "127.0.0.1"
+BLOCK_IP = "0.0.0.0"
+BLOCK_TTL = 60
+
+CACHE_SIZE = 4096
+CACHE_MAX_TTL = 3600
+
+QTYPE_A = 1
+QTYPE_AAAA = 28
+RCODE_FORMERR = 1
+RCODE_SERVFAIL = 2
+
+class SuffixTrie:
+    # Reversed-label trie for "*.domain" rules: "m.youtube.com" walks
+    # com -> youtube -> m, so a match costs one dict lookup per label.
+    TERMINAL = ""  # never a valid label, marks the end of a rule
+
+    def __init__(self):
+        self.root = {}
+        self.size = 0
+
+    def add(self, domain):
+        node = self.root
+        for label in reversed(domain.split(".")):
+            node = node.setdefault(label, {})
+        if self.TERMINAL not in node:
+            node[self.TERMINAL] = True
+            self.size += 1
+
+    def match(self, name):
+        # True if name equals a rule's domain or is any subdomain of it
+        node = self.root
+        for label in reversed(name.split(".")):
+            node = node.get(label)
+            if node is None:
+                return False
+            if self.TERMINAL in node:
+                return True
+        return False
+
+class Blocklist:
+    def __init__(self):
+        self.goal = set()
+        self.goal_wildcards = SuffixTrie()
+        self.ads = set()
+
+    def load(self):
+        try:
+            with open(STATE_FILE, 'r') as f:
+                state = json.load(f)
+        except:
+            state = {}
+
+        goal = {d.lower().rstrip('.') for d in state.get("goal", [])}
+        wildcards = SuffixTrie()
+        for domain in state.get("goal_wildcards", []):
+            wildcards.add(domain.lower().rstrip('.'))
+        ads = set()
+        ads_file = state.get("ads_file")
+        if state.get("ads") and ads_file:
+            try:
+                with open(ads_file, 'r') as f:
+                    for line in f:
+                        if line.startswith(BLOCK_IP + " "):
+                            ads.add(line.split()[1])
+            except Exception as e:
+                print(f"Error reading ad list: {e}")
+
+        self.goal, self.goal_wildcards, self.ads = goal, wildcards, ads
+        print(f"Loaded {len(goal)} goal, {wildcards.size} wildcard and {len(ads)} ad domains")
+
+    def lookup(self, name):
+        # Returns the address to answer with, or None to forward
+        if name in self.goal or self.goal_wildcards.match(name):
+            return REDIRECT_IP
+        if name in self.ads:
+            return BLOCK_IP
+        return None
+
+def read_upstream():
+    try:
+        with open(SETTINGS_FILE, 'r') as f:
+            return json.load(f).get("dns_upstream") or DEFAULT_UPSTREAM
+    except:
+        return DEFAULT_UPSTREAM
+
+# --- Wire format helpers ---
+
+def skip_name(msg, pos):
+    while True:
+        length = msg[pos]
+        if length == 0:
+            return pos + 1
+        if length & 0xC0 == 0xC0:
+            return pos + 2
+        pos += length + 1
+
+def parse_question(msg):
+    # Returns (name, qtype, qclass, end offset of the question)
+    labels = []
+    pos = 12
+    while True:
+        length = msg[pos]
+        if length == 0:
+            pos += 1
+            break
+        if length & 0xC0:
+            raise ValueError("compressed question name")
+        labels.append(msg[pos + 1:pos + 1 + length].decode('ascii', errors='replace'))
+        pos += length + 1
+    qtype, qclass = struct.unpack("!HH", msg[pos:pos + 4])
+    return ".".join(labels).lower(), qtype, qclass, pos + 4
+
+def build_reply(query, q_end, rcode=0, address=None, qtype=None):
+    # Echoes the question (if q_end is past the header) and optionally appends
+    # one A/AAAA answer
+    qid, flags = struct.unpack("!HH", query[:4])
+    flags = 0x8000 | (flags & 0x0100) | 0x0080 | rcode  # QR, keep RD, set RA
+    answers = b""
+    if address is not None and qtype == QTYPE_A:
+        answers = b"\xc0\x0c" + struct.pack("!HHIH", QTYPE_A, 1, BLOCK_TTL, 4) + socket.inet_aton(address)
+    elif address is not None and qtype == QTYPE_AAAA:
+        address6 = "::1" if address == REDIRECT_IP else "::"
+        answers = b"\xc0\x0c" + struct.pack("!HHIH", QTYPE_AAAA, 1, BLOCK_TTL, 16) + socket.inet_pton(socket.AF_INET6, address6)
+    header = struct.pack("!HHHHHH", qid, flags, 1 if q_end > 12 else 0, 1 if answers else 0, 0, 0)
+    return header + query[12:q_end] + answers
+
+def response_ttls(msg):
+    # Offsets of every TTL field in the answer/authority sections plus their minimum
+    _, _, qdcount, ancount, nscount, _ = struct.unpack("!HHHHHH", msg[:12])
+    pos = 12
+    for _ in range(qdcount):
+        pos = skip_name(msg, pos) + 4
+    offsets = []
+    for _ in range(ancount + nscount):
+        pos = skip_name(msg, pos)
+        offsets.append(pos + 4)
+        rdlength = struct.unpack("!H", msg[pos + 8:pos + 10])[0]
+        pos += 10 + rdlength
+    ttls = [struct.unpack("!I", msg[o:o + 4])[0] for o in offsets]
+    return offsets, min(ttls) if ttls else 0
+
+class ResponseCache:
+    def __init__(self, size=CACHE_SIZE):
+        self.size = size
+        self.entries = collections.OrderedDict()
+
+    def get(self, key, qid):
+        entry = self.entries.get(key)
+        if not entry:
+            return None
+        expires, stored_at, msg, offsets = entry
+        now = time.monotonic()
+        if now >= expires:
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+
+        # Patch the transaction ID and age the TTLs
+        out = bytearray(msg)
+        out[0:2] = struct.pack("!H", qid)
+        elapsed = int(now - stored_at)
+        for o in offsets:
+            ttl = struct.unpack("!I", msg[o:o + 4])[0]
+            out[o:o + 4] = struct.pack("!I", max(0, ttl - elapsed))
+        return bytes(out)
+
+    def put(self, key, msg):
+        try:
+            rcode = msg[3] & 0x0F
+            if msg[2] & 0x02 or rcode not in (0, 3):
+                return  # don't cache truncated or failed responses
+            offsets, ttl = response_ttls(msg)
+        except (IndexError, struct.error):
+            return
+        ttl = min(ttl, CACHE_MAX_TTL)
+        if ttl <= 0:
+            return
+        now = time.monotonic()
+        self.entries[key] = (now + ttl, now, msg, offsets)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+
+class UpstreamClient(asyncio.DatagramProtocol):
+    # One shared UDP socket to the upstream; replies are matched by rewritten ID
+    def __init__(self):
+        self.transport = None
+        self.pending = {}
+        self.rng = random.SystemRandom()
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        if len(data) < 12:
+            return
+        future = self.pending.pop(struct.unpack("!H", data[:2])[0], None)
+        if future and not future.done():
+            future.set_result(data)
+
+    async def query(self, msg):
+        # Random IDs make off-path spoofing of cached answers harder
+        upstream_id = self.rng.randrange(0x10000)
+        while upstream_id in self.pending:
+            upstream_id = self.rng.randrange(0x10000)
+        future = asyncio.get_running_loop().create_future()
+        self.pending[upstream_id] = future
+        self.transport.sendto(struct.pack("!H", upstream_id) + msg[2:])
+        try:
+            reply = await asyncio.wait_for(future, UPSTREAM_TIMEOUT)
+        finally:
+            self.pending.pop(upstream_id, None)
+        return msg[:2] + reply[2:]
+
+class Resolver:
+    def __init__(self, upstream):
+        self.upstream = upstream
+        self.blocklist = Blocklist()
+        self.cache = ResponseCache()
+        self.client = None
+
+    def reload(self):
+        self.blocklist.load()
+        self.cache.clear()
+
+    async def start_upstream(self):
+        loop = asyncio.get_running_loop()
+        _, self.client = await loop.create_datagram_endpoint(
+            UpstreamClient, remote_addr=(self.upstream, 53))
+
+    async def resolve(self, msg, tcp=False):
+        try:
+            name, qtype, qclass, q_end = parse_question(msg)
+        except (IndexError, ValueError, struct.error):
+            if len(msg) >= 12:
+                # Header only, every section count zero
+                return build_reply(msg, 12, RCODE_FORMERR)
+            return None
+
+        address = self.blocklist.lookup(name)
+        if address is not None:
+            return build_reply(msg, q_end, address=address, qtype=qtype)
+
+        qid = struct.unpack("!H", msg[:2])[0]
+        key = (name, qtype, qclass)
+        cached = self.cache.get(key, qid)
+        if cached:
+            return cached
+
+        try:
+            if tcp:
+                reply = await self.forward_tcp(msg)
+            else:
+                reply = await self.client.query(msg)
+        except (asyncio.TimeoutError, OSError):
+            return build_reply(msg, q_end, RCODE_SERVFAIL)
+        self.cache.put(key, reply)
+        return reply
+
+    async def forward_tcp(self, msg):
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(self.upstream, 53), UPSTREAM_TIMEOUT)
+        try:
+            writer.write(struct.pack("!H", len(msg)) + msg)
+            await writer.drain()
+            length = struct.unpack("!H", await asyncio.wait_for(reader.readexactly(2), UPSTREAM_TIMEOUT))[0]
+            return await asyncio.wait_for(reader.readexactly(length), UPSTREAM_TIMEOUT)
+        finally:
+            writer.close()
+
+class DnsUdpServer(asyncio.DatagramProtocol):
+    def __init__(self, resolver):
+        self.resolver = resolver
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        asyncio.ensure_future(self.answer(data, addr))
+
+    async def answer(self, data, addr):
+        reply = await self.resolver.resolve(data)
+        if reply:
+            self.transport.sendto(reply, addr)
+
+async def handle_tcp(resolver, reader, writer):
+    try:
+        while True:
+            length = struct.unpack("!H", await reader.readexactly(2))[0]
+            reply = await resolver.resolve(await reader.readexactly(length), tcp=True)
+            if reply:
+                writer.write(struct.pack("!H", len(reply)) + reply)
+                await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+def running_pid():
+    # PID of a live sinkhole from PID_FILE, or None
+    try:
+        with open(PID_FILE, 'r') as f:
+            pid = int(f.read().strip())
+        with open(f"/proc/{pid}/cmdline", 'rb') as f:
+            return pid if b"dns_sinkhole" in f.read() else None
+    except (OSError, ValueError):
+        return None
+
+def write_pid():
+    os.makedirs(STATE_DIR, exist_ok=True)
+    with open(PID_FILE + ".tmp", 'w') as f:
+        f.write(f"{os.getpid()}\n")
+    os.replace(PID_FILE + ".tmp", PID_FILE)
+
+def remove_pid():
+    # Only our own pidfile; a newer instance may have replaced it
+    if running_pid() == os.getpid():
+        try: os.remove(PID_FILE)
+        except: pass
+
+async def serve():
+    resolver = Resolver(read_upstream())
+    resolver.reload()
+    await resolver.start_upstream()
+
+    loop = asyncio.get_running_loop()
+    loop.add_signal_handler(signal.SIGHUP, resolver.reload)
+    await loop.create_datagram_endpoint(lambda: DnsUdpServer(resolver), local_addr=(LISTEN_ADDR, LISTEN_PORT))
+    server = await asyncio.start_server(lambda r, w: handle_tcp(resolver, r, w), LISTEN_ADDR, LISTEN_PORT)
+
+    # SIGTERM exits through the finally below so the pidfile goes with us
+    stop = asyncio.Event()
+    loop.add_signal_handler(signal.SIGTERM, stop.set)
+
+    write_pid()
+    print(f"DNS sinkhole on {LISTEN_ADDR}:{LISTEN_PORT}, upstream {resolver.upstream}")
+    try:
+        async with server:
+            await stop.wait()
+    finally:
+        remove_pid()
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+    except Exception as e:
+        print(f"DNS Sinkhole Error: {e}")
+        sys.exit(1)
@@ -1,23 +1,67 @@
 #!/usr/bin/env python3
 import os
 import json
+import math
 import time
+import ctypes
+import select
+import socket
 import subprocess
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from datetime import datetime
 
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from file_watch import FileWatch
+import session_log
+from hosts_client import hosts_request
+
 SESSION_FILE = "/tmp/sddm_session.json"
-TIMER_FILE = "/tmp/session_timer"
-BREAK_COUNTDOWN_FILE = "/tmp/pomodoro_break_countdown"
+# Only used if inotify isn't available
+SESSION_POLL_INTERVAL = 0.25
+# A handoff stamped (by the SDDM theme) longer ago than this is left from an earlier login
+SESSION_MAX_AGE = 300
+# Per-user runtime state. Files other processes watch with inotify get a
+# directory of their own, so neighbouring writes (the break countdown ticks
+# every second) don't wake the watchers.
+RUNTIME_DIR = os.path.join(os.getenv("XDG_RUNTIME_DIR") or f"/run/user/{os.getuid()}", "hyprfocus")
+# Timer phase + end timestamp, streamed to waybar by timer_status.py
+TIMER_STATE_FILE = os.path.join(RUNTIME_DIR, "timer", "session_timer.json")
+# Read by hyprlock during breaks
+BREAK_COUNTDOWN_FILE = os.path.join(RUNTIME_DIR, "pomodoro_break_countdown")
+STATUS_TEXT_FILE = os.path.join(RUNTIME_DIR, "pomodoro_status_text")
 INTENTION_FILE = "/tmp/pomodoro_intention"
-LOG_FILE = os.path.expanduser("~/session_logs.jsonl")
-STATUS_TEXT_FILE = "/tmp/pomodoro_status_text"
+# Relock after an early unlock; backs off while hyprlock keeps failing
+RELOCK_DELAY = 1
+RELOCK_MAX_DELAY = 30
 HYPRLOCK_UNIFIED = os.path.expanduser("~/.config/hypr/hyprlock_unified.conf")
 SETTINGS_FILE = os.path.expanduser("~/.config/hypr/settings.json")
 SWITCH_THEME_SCRIPT = os.path.expanduser("~/.config/hypr/scripts/switch_theme.sh")
 HOSTS_MANAGER_SCRIPT = "/usr/local/bin/hosts_manager.py"
 REDIRECT_SERVER_SCRIPT = "/usr/local/bin/redirect_server.py"
 CA_MANAGER_SCRIPT = os.path.expanduser("~/.config/hypr/scripts/ca_manager.py")
+# Per-step timings of the last login's bootstrap
+STARTUP_TRACE_FILE = "/tmp/session_startup_trace.json"
+# Goal/intention for redirect_server.py's focus page
+FOCUS_FILE = os.path.join(RUNTIME_DIR, "focus", "focus.json")
+REDIRECT_SOCKET = "/run/hyprfocus/redirect.sock"
+REDIRECT_PID_FILE = "/run/hyprfocus/redirect.pid"
+
+# Session deadlines live on CLOCK_BOOTTIME: it keeps counting through suspend
+# and ignores NTP steps and timezone changes. Wall time is only derived (via
+# an anchor) to tell waybar when a phase ends.
+CLOCK_BOOTTIME = getattr(time, "CLOCK_BOOTTIME", 7)
+TFD_CLOEXEC = 0o2000000
+TFD_TIMER_ABSTIME = 1
+TFD_TIMER_CANCEL_ON_SET = 2
+SUSPEND_GAP = 2  # seconds CLOCK_MONOTONIC missed while CLOCK_BOOTTIME ran on
+
+class timespec(ctypes.Structure):
+    _fields_ = [("tv_sec", ctypes.c_long), ("tv_nsec", ctypes.c_long)]
+
+class itimerspec(ctypes.Structure):
+    _fields_ = [("it_interval", timespec), ("it_value", timespec)]
 
 def notify(summary, body, urgency="normal"):
     subprocess.run(["notify-send", "-u", urgency, summary, body])
@@ -29,6 +73,16 @@ def write_file(path, content):
     except:
         pass
 
+def publish_timer(phase, end=None):
+    # Written once per phase change (atomically); readers do the counting down
+    state = {"phase": phase, "end": end}
+    try:
+        with open(TIMER_STATE_FILE + ".tmp", "w") as f:
+            json.dump(state, f)
+        os.replace(TIMER_STATE_FILE + ".tmp", TIMER_STATE_FILE)
+    except:
+        pass
+
 def load_settings():
     if os.path.exists(SETTINGS_FILE):
         try:
@@ -38,19 +92,39 @@ def load_settings():
             pass
     return {}
 
+def read_session_file():
+    # None while the file is missing, not a complete JSON object yet, or stale
+    try:
+        with open(SESSION_FILE, 'r') as f:
+            data = json.load(f)
+        if not isinstance(data, dict):
+            return None
+        written = data.get("written")
+        if isinstance(written, (int, float)) and time.time() - written / 1000 > SESSION_MAX_AGE:
+            return None
+        return data
+    except (OSError, ValueError):
+        return None
+
 def get_session_data(timeout=10):
-    start_wait = time.time()
-    while time.time() - start_wait < timeout:
-        if os.path.exists(SESSION_FILE):
-            try:
-                with open(SESSION_FILE, 'r') as f:
-                    data = json.load(f)
-                return data
-            except (json.JSONDecodeError, IOError):
-                time.sleep(0.5)
-                continue
-        time.sleep(0.5)
-    return None
+    # Waits for SDDM's handoff. The watch is set up before the first look so
+    # a write in between isn't missed; after that the file is only parsed
+    # once its writer has closed it (or renamed it into place), so a
+    # half-written file is never mistaken for the real thing.
+    watch = FileWatch([SESSION_FILE], poll_interval=SESSION_POLL_INTERVAL)
+    try:
+        deadline = time.monotonic() + timeout
+        data = read_session_file()
+        while data is None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                log_debug("No session handoff from SDDM, using defaults")
+                return None
+            if watch.wait(remaining):
+                data = read_session_file()
+        return data
+    finally:
+        watch.close()
 
 def log_session(data, session_type="start"):
     log_entry = {
@@ -61,11 +135,7 @@ def log_session(data, session_type="start"):
         "duration": data.get("duration"),
         "pomodoro": data.get("pomodoro")
     }
-    try:
-        with open(LOG_FILE, 'a') as f:
-            f.write(json.dumps(log_entry) + "\n")
-    except Exception as e:
-        print(f"Failed to log: {e}")
+    session_log.log_event(log_entry)
 
 def get_new_intention(current_goal):
     qml_path = os.path.expanduser("~/.config/hypr/scripts/CheckIn.qml")
@@ -93,6 +163,144 @@ def get_new_intention(current_goal):
         print(f"Error: {e}")
         return "Focus"
 
+class SessionClock:
+    # Absolute-deadline sleeps on timerfds: one on CLOCK_BOOTTIME for the
+    # deadline, one on CLOCK_REALTIME that fires when the wall clock is set.
+    # Without timerfd (no ctypes/libc) it sleeps in bounded slices instead.
+    def __init__(self):
+        self.libc = None
+        try:
+            self.libc = ctypes.CDLL(None, use_errno=True)
+            self.timer_fd = self.timerfd(CLOCK_BOOTTIME)
+            self.clock_fd = self.timerfd(time.CLOCK_REALTIME)
+        except (OSError, AttributeError) as e:
+            log_debug(f"timerfd unavailable ({e}), sleeping in slices")
+            self.libc = None
+        self.reanchor()
+
+    def timerfd(self, clock_id):
+        fd = self.libc.timerfd_create(clock_id, TFD_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), "timerfd_create failed")
+        return fd
+
+    def arm(self, fd, when, flags):
+        spec = itimerspec(timespec(0, 0), timespec(int(when), int((when % 1) * 1e9)))
+        if self.libc.timerfd_settime(fd, flags, ctypes.byref(spec), None) < 0:
+            raise OSError(ctypes.get_errno(), "timerfd_settime failed")
+
+    def now(self):
+        return time.clock_gettime(CLOCK_BOOTTIME)
+
+    def reanchor(self):
+        self.anchor = self.now()
+        self.anchor_wall = time.time()
+        if self.libc:
+            # Cancelled (read fails with ECANCELED) as soon as the clock is set
+            self.arm(self.clock_fd, self.anchor_wall + 365 * 86400, TFD_TIMER_ABSTIME | TFD_TIMER_CANCEL_ON_SET)
+
+    def deadline(self, seconds):
+        return self.now() + seconds
+
+    def remaining(self, deadline):
+        return deadline - self.now()
+
+    def wall(self, deadline):
+        return self.anchor_wall + (deadline - self.anchor)
+
+    def wait(self, deadline, fds=()):
+        # Sleeps until deadline (None: no deadline), one of fds becomes
+        # readable, or the wall clock is set. Returns (moved, ready fds):
+        # moved is True if the wall anchor changed (clock set or suspend), so
+        # callers can republish wall times before sleeping on.
+        before, before_awake = self.now(), time.monotonic()
+        fds = list(fds)
+        if self.libc:
+            watch = fds + [self.clock_fd]
+            if deadline is not None:
+                self.arm(self.timer_fd, max(deadline, before + 0.001), TFD_TIMER_ABSTIME)
+                watch.append(self.timer_fd)
+            ready, _, _ = select.select(watch, [], [])
+            for fd in ready:
+                if fd in (self.timer_fd, self.clock_fd):
+                    try: os.read(fd, 8)
+                    except OSError: pass  # ECANCELED from a clock change
+            clock_set = self.clock_fd in ready
+        else:
+            timeout = 30 if deadline is None else max(0, min(deadline - before, 30))
+            if fds:
+                ready, _, _ = select.select(fds, [], [], timeout)
+            else:
+                time.sleep(timeout)
+                ready = []
+            clock_set = abs((time.time() - self.anchor_wall) - (self.now() - self.anchor)) > 1
+
+        suspended = (self.now() - before) - (time.monotonic() - before_awake)
+        if suspended > SUSPEND_GAP:
+            log_debug(f"Resumed after ~{int(suspended)}s of suspend")
+        moved = clock_set or suspended > SUSPEND_GAP
+        if moved:
+            self.reanchor()
+        return moved, [fd for fd in ready if fd in fds]
+
+    def sleep_until(self, deadline):
+        return self.wait(deadline)[0]
+
+    def close(self):
+        if self.libc:
+            for fd in (self.timer_fd, self.clock_fd):
+                try: os.close(fd)
+                except: pass
+
+def sleep_phase(clock, deadline, phase, end):
+    # Sleeps straight to deadline; republishes the phase's wall end time
+    # whenever the anchor moves so waybar stays right
+    while clock.remaining(deadline) > 0:
+        if clock.sleep_until(deadline):
+            publish_timer(phase, clock.wall(end))
+
+class BreakDisplay:
+    # The text hyprlock shows during a break. Files are rewritten only when
+    # their text changes, i.e. once per second at most.
+    def __init__(self):
+        self.shown = {}
+
+    def show(self, path, text):
+        if self.shown.get(path) != text:
+            write_file(path, text)
+            self.shown[path] = text
+
+    def countdown(self, remaining):
+        mins, secs = divmod(math.ceil(max(0, remaining)), 60)
+        self.show(BREAK_COUNTDOWN_FILE, f"{mins:02d}:{secs:02d}")
+
+    def complete(self):
+        self.show(STATUS_TEXT_FILE, "BREAK COMPLETE")
+        self.show(BREAK_COUNTDOWN_FILE, "Unlock Now")
+
+def hold_lock(clock, lock_proc, break_end, display):
+    # Blocks until hyprlock exits. Wakes only on second boundaries (to update
+    # the countdown) and on the child's exit, via a pidfd where available.
+    try:
+        pidfd = os.pidfd_open(lock_proc.pid)
+    except (AttributeError, OSError):
+        pidfd = None
+    try:
+        while lock_proc.poll() is None:
+            remaining = clock.remaining(break_end)
+            if remaining > 0:
+                display.countdown(remaining)
+                deadline = break_end - (math.ceil(remaining) - 1)
+            else:
+                display.complete()
+                deadline = None if pidfd is not None else clock.deadline(1)
+            moved, _ = clock.wait(deadline, [pidfd] if pidfd is not None else [])
+            if moved:
+                publish_timer("break", clock.wall(break_end))
+    finally:
+        if pidfd is not None:
+            os.close(pidfd)
+
 def run_pomodoro(data, settings):
     pomo_settings = settings.get("pomodoro", {})
     work_duration = int(pomo_settings.get("work_duration", 25)) * 60
@@ -111,18 +319,14 @@ def run_pomodoro(data, settings):
         pass
         
     pomodoros_completed = 0
+    clock = SessionClock()
     
     while True:
         # --- WORK PHASE ---
         notify("Pomodoro Started", f"Focus: {current_intention}")
-        start_time = time.time()
-        end_time = start_time + work_duration
-        
-        while time.time() < end_time:
-            remaining = end_time - time.time()
-            mins, secs = divmod(int(remaining), 60)
-            write_file(TIMER_FILE, f"{mins:02d}:{secs:02d} [WORK]")
-            time.sleep(1)
+        end_time = clock.deadline(work_duration)
+        publish_timer("work", clock.wall(end_time))
+        sleep_phase(clock, end_time, "work", end_time)
             
         pomodoros_completed += 1
         
@@ -136,36 +340,34 @@ def run_pomodoro(data, settings):
 
         time.sleep(2)
         
-        break_end = time.time() + break_duration
-        write_file(STATUS_TEXT_FILE, "POMODORO BREAK")
+        break_end = clock.deadline(break_duration)
+        display = BreakDisplay()
+        display.show(STATUS_TEXT_FILE, "POMODORO BREAK")
+        publish_timer("break", clock.wall(break_end))
         
         # --- LOCK LOOP ---
+        relock_delay = RELOCK_DELAY
         while True:
-            remaining = break_end - time.time()
-            mins, secs = divmod(int(max(0, remaining)), 60)
-            write_file(BREAK_COUNTDOWN_FILE, f"{mins:02d}:{secs:02d}")
-            write_file(TIMER_FILE, "BREAK")
+            display.countdown(clock.remaining(break_end))
             
             # Start Hyprlock (Unified - Password Only)
             lock_proc = subprocess.Popen(["hyprlock", "--config", HYPRLOCK_UNIFIED])
+            hold_lock(clock, lock_proc, break_end, display)
             
-            while lock_proc.poll() is None:
-                remaining = break_end - time.time()
-                mins, secs = divmod(int(max(0, remaining)), 60)
-                write_file(BREAK_COUNTDOWN_FILE, f"{mins:02d}:{secs:02d}")
-                
-                if remaining <= 0:
-                    write_file(STATUS_TEXT_FILE, "BREAK COMPLETE")
-                    write_file(BREAK_COUNTDOWN_FILE, "Unlock Now")
-                
-                time.sleep(0.5)
-            
-            if time.time() >= break_end:
+            if clock.remaining(break_end) <= 0:
                 break # Valid unlock
+            
+            # An unlock (exit 0) is always relocked promptly, however fast the
+            # password was typed. A crashing hyprlock (error or signal exit)
+            # would otherwise respawn in a tight loop, so that backs off.
+            if lock_proc.returncode != 0:
+                relock_delay = min(relock_delay * 2, RELOCK_MAX_DELAY)
             else:
-                notify("Break Not Over", "Screen re-locking...", "critical")
-                time.sleep(1)
-                continue
+                relock_delay = RELOCK_DELAY
+            notify("Break Not Over", "Screen re-locking...", "critical")
+            clock.sleep_until(min(clock.deadline(relock_delay), break_end))
+            if clock.remaining(break_end) <= 0:
+                break
         
         # --- CHECK-IN PHASE ---
         if show_popup:
@@ -173,6 +375,7 @@ def run_pomodoro(data, settings):
             new_int = get_new_intention(goal)
             if new_int:
                 current_intention = new_int
+                push_focus(goal, current_intention)
             
         log_session({"goal": goal, "intention": current_intention}, session_type="pomodoro_segment")
 
@@ -182,22 +385,17 @@ def run_standard_timer(data):
     except:
         duration_mins = 60
         
-    end_time = time.time() + (duration_mins * 60)
-    warning_sent = False
+    clock = SessionClock()
+    end_time = clock.deadline(duration_mins * 60)
+    publish_timer("session", clock.wall(end_time))
 
-    while True:
-        remaining = end_time - time.time()
-        if remaining <= 0:
-            break
-            
-        if remaining <= 60 and not warning_sent:
-            notify("System Shutdown", "Session ending in 1 minute!", "critical")
-            warning_sent = True
-            
-        mins = int(max(0, remaining) // 60)
-        secs = int(max(0, remaining) % 60)
-        write_file(TIMER_FILE, f"{mins:02d}:{secs:02d}")
-        time.sleep(1)
+    # Sleep straight to the one-minute warning, then to the end
+    sleep_phase(clock, end_time - 60, "session", end_time)
+    if clock.remaining(end_time) > 0:
+        notify("System Shutdown", "Session ending in 1 minute!", "critical")
+    sleep_phase(clock, end_time, "session", end_time)
+    publish_timer("idle")
+    clock.close()
 
     # Clean up blocks before exit
     clean_blocks()
@@ -214,42 +412,85 @@ def log_debug(msg):
             f.write(f"{datetime.now().isoformat()} - {msg}\n")
     except: pass
 
+def redirect_server_running():
+    # The server writes its pidfile once ports 80/443 are bound
+    try:
+        with open(REDIRECT_PID_FILE, 'r') as f:
+            pid = int(f.read().strip())
+        with open(f"/proc/{pid}/cmdline", 'rb') as f:
+            return b"redirect_server" in f.read()
+    except (OSError, ValueError):
+        return False
+
 def start_redirect_server():
     log_debug("Checking redirect server...")
-    # Check if running
-    try:
-        # Check if port 80 is used
-        subprocess.check_output(["lsof", "-i", ":80"])
+    if redirect_server_running():
         log_debug("Redirect server already running.")
-    except:
-        # Not running, start it
-        log_debug("Starting Redirect Server...")
-        subprocess.Popen(["sudo", REDIRECT_SERVER_SCRIPT], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        return
+    # Not running, start it. No need to wait: it picks up the focus file on
+    # startup, and a second instance exits if one got there first.
+    log_debug("Starting Redirect Server...")
+    subprocess.Popen(["sudo", REDIRECT_SERVER_SCRIPT], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
 
-def apply_blocks(goal, settings):
+def push_focus(goal, intention):
+    # The file is what a (re)starting server picks up and what its watcher
+    # sees; the socket makes the running server switch right away.
+    data = {"goal": goal, "intention": intention}
+    try:
+        with open(FOCUS_FILE + ".tmp", "w") as f:
+            json.dump(data, f)
+        os.replace(FOCUS_FILE + ".tmp", FOCUS_FILE)
+    except Exception as e:
+        log_debug(f"Failed to write focus file: {e}")
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(2)
+            sock.connect(REDIRECT_SOCKET)
+            sock.sendall((json.dumps(data) + "\n").encode())
+            sock.recv(4096)
+    except OSError:
+        pass
+
+def start_hosts_daemon():
+    if hosts_request([{"op": "ping"}], timeout=2) is not None:
+        return True
+    log_debug("Starting hosts daemon...")
+    subprocess.Popen(["sudo", HOSTS_MANAGER_SCRIPT, "daemon"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    for _ in range(30):
+        time.sleep(0.1)
+        if hosts_request([{"op": "ping"}], timeout=2) is not None:
+            return True
+    log_debug("Hosts daemon did not come up, using sudo per call.")
+    return False
+
+def apply_hosts(goal, settings):
+    # Goal blocks and adblock state in one round trip and one hosts write
     log_debug(f"Applying blocks for {goal}")
     filters = settings.get("filters", {}).get(goal, [])
+    ads_enabled = settings.get("ad_blocking", False)
     if filters:
         print(f"Applying blocklist for {goal}: {filters}")
-        domains_str = ",".join(filters)
-        subprocess.run(["sudo", HOSTS_MANAGER_SCRIPT, domains_str])
     else:
         print(f"No blocklist for {goal}, clearing blocks.")
-        clean_blocks()
-    log_debug("Blocks applied.")
-
-def apply_adblock(settings):
-    log_debug("Checking Adblock settings...")
-    if settings.get("ad_blocking", False):
-        log_debug("Enabling Adblock")
-        subprocess.run(["sudo", HOSTS_MANAGER_SCRIPT, "ads", "on"])
+    
+    reply = hosts_request([{"op": "profile", "domains": filters, "ads": ads_enabled}])
+    if reply is None:
+        # No daemon: still a single sudo invocation
+        args = ["profile", "on" if ads_enabled else "off"]
+        if filters:
+            args.append(",".join(filters))
+        subprocess.run(["sudo", HOSTS_MANAGER_SCRIPT] + args)
     else:
-        log_debug("Disabling Adblock")
-        subprocess.run(["sudo", HOSTS_MANAGER_SCRIPT, "ads", "off"])
+        if reply.get("error"):
+            log_debug(f"Hosts profile: {reply['error']}")
+        for result in reply.get("results", []):
+            log_debug(f"Hosts profile: {result}")
+    log_debug("Blocks applied.")
 
 def clean_blocks():
     log_debug("Cleaning blocks...")
-    subprocess.run(["sudo", HOSTS_MANAGER_SCRIPT, "clear"])
+    if hosts_request([{"op": "clear"}]) is None:
+        subprocess.run(["sudo", HOSTS_MANAGER_SCRIPT, "clear"])
 
 def apply_theme(goal, settings):
     log_debug(f"Applying theme for {goal}")
@@ -260,31 +501,95 @@ def apply_theme(goal, settings):
         subprocess.run([SWITCH_THEME_SCRIPT, theme])
     log_debug("Theme applied.")
 
-def main():
-    log_debug("Session Manager Started")
-    settings = load_settings()
-    data = get_session_data()
+def run_bootstrap(steps):
+    # steps: (name, [dependencies], fn). Each step starts as soon as its
+    # dependencies have finished, so independent ones run side by side.
+    # A failed step is logged and still counts as finished for its dependents.
+    # Writes per-step start offsets and durations to STARTUP_TRACE_FILE.
+    started = time.monotonic()
+    trace = []
+    lock = threading.Lock()
+    
+    def timed(name, fn):
+        step_start = time.monotonic()
+        error = None
+        try:
+            fn()
+        except Exception as e:
+            error = str(e)
+            log_debug(f"Bootstrap step {name} failed: {e}")
+        with lock:
+            trace.append({
+                "step": name,
+                "start_ms": round((step_start - started) * 1000, 1),
+                "duration_ms": round((time.monotonic() - step_start) * 1000, 1),
+                "error": error,
+            })
+    
+    pending = list(steps)
+    done = set()
+    running = {}
+    with ThreadPoolExecutor(max_workers=max(1, len(steps))) as pool:
+        while pending or running:
+            for step in [step for step in pending if all(dep in done for dep in step[1])]:
+                pending.remove(step)
+                running[pool.submit(timed, step[0], step[2])] = step[0]
+            if not running:
+                log_debug(f"Bootstrap steps with unmet dependencies: {[step[0] for step in pending]}")
+                break
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                done.add(running.pop(future))
     
+    total_ms = round((time.monotonic() - started) * 1000, 1)
+    trace.sort(key=lambda entry: entry["start_ms"])
+    log_debug(f"Bootstrap finished in {total_ms}ms: " + ", ".join(f"{e['step']}={e['duration_ms']}ms" for e in trace))
+    try:
+        with open(STARTUP_TRACE_FILE, "w") as f:
+            json.dump({"timestamp": datetime.now().isoformat(), "total_ms": total_ms, "steps": trace}, f, indent=2)
+    except: pass
+
+def read_session():
+    data = get_session_data()
     if not data:
         data = {"goal": "Default", "intention": "No intention provided", "duration": 60, "pomodoro": False}
     
     if os.path.exists(SESSION_FILE):
         try: os.remove(SESSION_FILE)
         except: pass
+    return data
 
-    # Start Services
-    start_redirect_server()
+def main():
+    log_debug("Session Manager Started")
+    for path in (TIMER_STATE_FILE, FOCUS_FILE):
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        except OSError as e:
+            log_debug(f"Failed to create {os.path.dirname(path)}: {e}")
+    # Seeded so the dependents (and the timer below) still run with defaults
+    # if the session_data step fails
+    session = {"data": {}, "settings": {}}
     
-    # Apply Goal Settings
-    current_goal = data.get("goal")
-    if current_goal:
-        apply_theme(current_goal, settings)
-        apply_blocks(current_goal, settings)
+    def load():
+        session["settings"] = load_settings()
+        session["data"] = read_session()
     
-    # Apply Adblock
-    apply_adblock(settings)
-
-    log_session(data, "login")
+    def theme():
+        if session["data"].get("goal"):
+            apply_theme(session["data"]["goal"], session["settings"])
+    
+    # Theme, redirect server and hosts don't depend on each other; the
+    # services don't even need the session data, so they start while we wait
+    run_bootstrap([
+        ("session_data", [], load),
+        ("hosts_daemon", [], start_hosts_daemon),
+        ("redirect_server", [], start_redirect_server),
+        ("focus_page", ["session_data"], lambda: push_focus(session["data"].get("goal"), session["data"].get("intention"))),
+        ("theme", ["session_data"], theme),
+        ("hosts", ["session_data", "hosts_daemon"], lambda: apply_hosts(session["data"].get("goal"), session["settings"])),
+        ("log_session", ["session_data"], lambda: log_session(session["data"], "login")),
+    ])
+    data, settings = session["data"], session["settings"]
     log_debug("Entering main loop")
     
     is_pomodoro = data.get("pomodoro", False)
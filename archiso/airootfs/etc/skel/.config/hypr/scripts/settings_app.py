@@ -3,16 +3,22 @@ import sys
 import os
 import json
 import time
+import threading
 import gi
 from datetime import datetime, timedelta
 
 gi.require_version('Gtk', '4.0')
-from gi.repository import Gtk, Gio, Gdk, GObject
+from gi.repository import Gtk, Gio, Gdk, GObject, GLib
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import session_log
+from hosts_client import hosts_request
 
 SETTINGS_FILE = os.path.expanduser("~/.config/hypr/settings.json")
 KEYBINDINGS_FILE = os.path.expanduser("~/.config/hypr/keybindings.conf")
 THEMES_DIR = os.path.expanduser("~/.config/hypr/themes")
-LOG_FILE = os.path.expanduser("~/session_logs.jsonl")
+HOSTS_MANAGER_SCRIPT = os.path.expanduser("~/.config/hypr/scripts/hosts_manager.py")
+JOURNAL_DAYS = 30  # how far back the journal page reads the session log
 
 class SettingsApp(Gtk.Application):
     def __init__(self):
@@ -51,12 +57,12 @@ class SettingsApp(Gtk.Application):
         # Separator
         main_box.append(Gtk.Separator(orientation=Gtk.Orientation.VERTICAL))
 
-        # Data Loading
-        self.logs = self.load_logs()
-
-        # Pages
-        stack.add_titled(self.create_dashboard_page(), "dashboard", "Dashboard")
-        stack.add_titled(self.create_journal_page(), "journal", "Journal")
+        # Pages (dashboard and journal fill in once the logs are loaded)
+        self.logs = []
+        self.dashboard_holder = self.create_loading_page()
+        self.journal_holder = self.create_loading_page()
+        stack.add_titled(self.dashboard_holder, "dashboard", "Dashboard")
+        stack.add_titled(self.journal_holder, "journal", "Journal")
         stack.add_titled(self.create_calendar_page(), "calendar", "Calendar")
         stack.add_titled(self.create_goals_page(), "goals", "Goals & Themes")
         stack.add_titled(self.create_filters_page(), "filters", "Web Filters")
@@ -75,6 +81,44 @@ class SettingsApp(Gtk.Application):
 
         window.present()
 
+        # Data Loading, off the GTK thread
+        threading.Thread(target=self.load_data, daemon=True).start()
+
+    def load_data(self):
+        # Stats come from the rollup and are quick; the journal reads the last
+        # JOURNAL_DAYS of entries
+        stats = self.calculate_stats()
+        GLib.idle_add(self.on_stats_loaded, stats)
+        today = datetime.now().date()
+        logs = self.load_logs(today - timedelta(days=JOURNAL_DAYS - 1), today)
+        GLib.idle_add(self.on_logs_loaded, logs)
+
+    def on_stats_loaded(self, stats):
+        self.fill_page(self.dashboard_holder, self.create_dashboard_page(stats))
+        return GLib.SOURCE_REMOVE
+
+    def on_logs_loaded(self, logs):
+        self.logs = logs
+        self.fill_page(self.journal_holder, self.create_journal_page())
+        return GLib.SOURCE_REMOVE
+
+    def create_loading_page(self):
+        holder = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, hexpand=True, vexpand=True)
+        spinner = Gtk.Spinner(spinning=True, halign=Gtk.Align.CENTER, valign=Gtk.Align.CENTER, vexpand=True)
+        spinner.set_size_request(32, 32)
+        holder.append(spinner)
+        return holder
+
+    def fill_page(self, holder, page):
+        child = holder.get_first_child()
+        while child:
+            next_child = child.get_next_sibling()
+            holder.remove(child)
+            child = next_child
+        page.set_hexpand(True)
+        page.set_vexpand(True)
+        holder.append(page)
+
     def on_config_changed(self, monitor, file, other_file, event_type):
         if event_type == Gio.FileMonitorEvent.CHANGES_DONE_HINT or event_type == Gio.FileMonitorEvent.CHANGED:
             self.apply_theme()
@@ -187,21 +231,15 @@ class SettingsApp(Gtk.Application):
         except Exception as e:
             print(f"Error saving settings: {e}")
 
-    def load_logs(self):
+    def load_logs(self, start=None, end=None):
         logs = []
-        if not os.path.exists(LOG_FILE):
-            return logs
         try:
-            with open(LOG_FILE, 'r') as f:
-                for line in f:
-                    try:
-                        data = json.loads(line)
-                        timestamp = data.get("timestamp") or data.get("date")
-                        if timestamp:
-                            data["dt"] = datetime.fromisoformat(timestamp)
-                            logs.append(data)
-                    except:
-                        continue
+            for data in session_log.read_events(start, end):
+                try:
+                    data["dt"] = datetime.fromisoformat(data.get("timestamp") or data.get("date"))
+                    logs.append(data)
+                except:
+                    continue
         except Exception as e:
             print(f"Error loading logs: {e}")
         logs.sort(key=lambda x: x["dt"], reverse=True)
@@ -1174,59 +1212,38 @@ class SettingsApp(Gtk.Application):
     # --- PAGES ---
 
     def calculate_stats(self):
+        # Reads the persisted per-day rollup, advanced only by what was logged
+        # since the last time the dashboard opened
+        today = datetime.now().date()
         stats = {
             "today_hours": 0, 
             "session_count": 0, 
             "recent_activity": [], 
             "avg_rating": 0.0,
-            "history": { (datetime.now().date() - timedelta(days=i)).strftime("%Y-%m-%d"): 0 for i in range(7) }
+            "history": { (today - timedelta(days=i)).strftime("%Y-%m-%d"): 0 for i in range(7) }
         }
-        
-        # Sort logs ascending to track flow
-        sorted_logs = sorted(self.logs, key=lambda x: x["dt"])
-        
-        active_session_start = None
-        rating_sum = 0
-        total_ratings = 0
-        
-        for i, data in enumerate(sorted_logs):
-            d_date = data["dt"].date()
-            date_str = d_date.strftime("%Y-%m-%d")
-            
-            if data.get("type") == "login":
-                active_session_start = data["dt"]
-                if date_str == datetime.now().strftime("%Y-%m-%d"):
-                    stats["session_count"] += 1
-                    
-            elif data.get("type") == "feedback":
-                if active_session_start:
-                    # Calculate actual duration
-                    delta = (data["dt"] - active_session_start).total_seconds() / 3600
-                    if delta > 0 and delta < 24: # Sanity check
-                        if date_str in stats["history"]:
-                            stats["history"][date_str] += delta
-                        
-                        if date_str == datetime.now().strftime("%Y-%m-%d"):
-                            stats["today_hours"] += delta
-                    
-                    active_session_start = None
-                
-                r = data.get("rating")
-                if isinstance(r, (int, float)):
-                    rating_sum += r
-                    total_ratings += 1
-
-        if total_ratings > 0:
-            stats["avg_rating"] = rating_sum / total_ratings
-            
-        # Recent activity from raw reverse logs
-        for item in self.logs[:10]:
-             if item.get("type") in ["login", "feedback", "pomodoro_segment"]:
-                stats["recent_activity"].append({
-                    "time": item["dt"].strftime("%H:%M"),
-                    "goal": item.get("goal", "Unknown"),
-                    "intention": item.get("intention", "")
-                })
+        try:
+            rollup = session_log.update_rollup()
+        except Exception as e:
+            print(f"Error loading stats: {e}")
+            return stats
+
+        for date_str in stats["history"]:
+            stats["history"][date_str] = rollup["days"].get(date_str, {}).get("focus_hours", 0)
+
+        today_stats = rollup["days"].get(today.strftime("%Y-%m-%d"), {})
+        stats["today_hours"] = today_stats.get("focus_hours", 0)
+        stats["session_count"] = today_stats.get("sessions", 0)
+
+        if rollup["ratings"] > 0:
+            stats["avg_rating"] = rollup["rating_sum"] / rollup["ratings"]
+
+        for item in rollup["recent"]:
+            stats["recent_activity"].append({
+                "time": datetime.fromisoformat(item["timestamp"]).strftime("%H:%M"),
+                "goal": item.get("goal") or "Unknown",
+                "intention": item.get("intention") or ""
+            })
                 
         return stats
 
@@ -1284,14 +1301,12 @@ class SettingsApp(Gtk.Application):
                 ctx.move_to(x + (bar_width - ext.width)/2, y - 5)
                 ctx.show_text(val_lbl)
 
-    def create_dashboard_page(self):
+    def create_dashboard_page(self, stats):
         scrolled = Gtk.ScrolledWindow()
         box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=20)
         box.set_margin_top(30); box.set_margin_bottom(30); box.set_margin_start(30); box.set_margin_end(30)
         scrolled.set_child(box)
 
-        stats = self.calculate_stats()
-
         # Header
         h_box = Gtk.Box(spacing=10)
         title = Gtk.Label(label="Overview", xalign=0); title.add_css_class("title-1")
@@ -1373,7 +1388,7 @@ class SettingsApp(Gtk.Application):
         journal_logs = [l for l in self.logs if l.get("type") == "feedback"]
         
         if not journal_logs:
-            box.append(Gtk.Label(label="No entries yet. Complete a session to see your history!"))
+            box.append(Gtk.Label(label=f"No entries in the last {JOURNAL_DAYS} days. Complete a session to see your history!"))
             return scrolled
 
         for date, group in groupby(journal_logs, key=get_date):
@@ -1597,16 +1612,17 @@ class SettingsApp(Gtk.Application):
     def on_adblock_change(self, switch, state):
         self.settings_data["ad_blocking"] = state
         self.save_settings()
-        # Apply immediately
-        import subprocess
-        cmd = "on" if state else "off"
-        script = os.path.expanduser("~/.config/hypr/scripts/hosts_manager.py")
-        subprocess.Popen(["sudo", script, "ads", cmd])
+        # Apply immediately, off the GTK thread
+        threading.Thread(target=self.send_hosts_command, args=({"op": "ads", "enable": state}, ["ads", "on" if state else "off"]), daemon=True).start()
 
     def on_update_ads(self, btn):
-        import subprocess
-        script = os.path.expanduser("~/.config/hypr/scripts/hosts_manager.py")
-        subprocess.Popen(["sudo", script, "ads", "update"])
+        threading.Thread(target=self.send_hosts_command, args=({"op": "ads_update"}, ["ads", "update"]), daemon=True).start()
+
+    def send_hosts_command(self, command, fallback_args):
+        # Prefer the running hosts daemon; fall back to a sudo invocation
+        if hosts_request([command], timeout=120) is None:
+            import subprocess
+            subprocess.Popen(["sudo", HOSTS_MANAGER_SCRIPT] + fallback_args)
 
     def refresh_filter_list(self, *args):
         # Clear
@@ -164,11 +164,14 @@ Rectangle {
         // db.transaction skipped - using settings.json as source of truth
         
         var data = {
+            "version": 1,
+            "written": Date.now(),  // lets session_manager.py skip a stale file
             "goal": currentGoal,
             "intention": intentionField.text,
             "duration": timeSlider.value,
             "pomodoro": pomodoroCheck.checked
         };
+        // session_manager.py parses this only after the write is closed
         var xhr = new XMLHttpRequest();
         xhr.open("PUT", "file:///tmp/sddm_session.json");
         xhr.send(JSON.stringify(data));
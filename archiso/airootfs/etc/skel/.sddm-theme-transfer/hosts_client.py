@@ -0,0 +1,37 @@
+import json
+import socket
+
+# Client side of the hosts_manager.py daemon protocol, shared by
+# hosts_manager.py, session_manager.py and settings_app.py.
+# One JSON object per line each way: {"commands": [{"op": ...}, ...]} in,
+# {"ok": ..., "results": [...]} out.
+HOSTS_SOCKET = "/run/hyprfocus/hosts.sock"
+
+def encode_message(message):
+    return (json.dumps(message) + "\n").encode('utf-8')
+
+def hosts_request(commands, timeout=30):
+    # Sends a batch to the daemon. Returns None only if no daemon accepted the
+    # connection; callers then fall back to running hosts_manager.py directly.
+    # A daemon that connected but didn't answer in time (e.g. still compiling
+    # the ad cache) gives {"ok": False, "error": ...}, so nobody starts a
+    # second root writer next to it.
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        try:
+            sock.connect(HOSTS_SOCKET)
+        except OSError:
+            return None
+        try:
+            sock.sendall(encode_message({"commands": commands}))
+            reply = b""
+            while not reply.endswith(b"\n"):
+                chunk = sock.recv(65536)
+                if not chunk:
+                    break
+                reply += chunk
+            return json.loads(reply)
+        except socket.timeout:
+            return {"ok": False, "error": f"no reply within {timeout}s"}
+        except (OSError, ValueError) as e:
+            return {"ok": False, "error": str(e)}
@@ -1,8 +1,24 @@
 #!/usr/bin/env python3
 import sys
 import os
+import errno
+import hashlib
+import heapq
+import json
+import time
+import re
+import signal
+import socketserver
+import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+import urllib.error
+import urllib.parse
 import urllib.request
 
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from hosts_client import HOSTS_SOCKET, encode_message, hosts_request
+
 HOSTS_PATH = "/etc/hosts"
 REDIRECT_IP = "127.0.0.1"
 BLOCK_IP = "0.0.0.0"
@@ -23,166 +39,823 @@ else:
     home_dir = os.path.expanduser("~")
 
 AD_CACHE_FILE = os.path.join(home_dir, ".config/hypr/adblock_list.txt")
-AD_SOURCE_URL = "https://raw.githubusercontent.com/StevenBlack/hosts/master/hosts"
+AD_COMPILED_FILE = os.path.join(home_dir, ".config/hypr/adblock_list.compiled")
+# Per-source ETag/Last-Modified of the last download, used for conditional requests
+AD_META_FILE = os.path.join(home_dir, ".config/hypr/adblock_list.meta.json")
+# One compiled cache per source; the merged AD_COMPILED_FILE is built from these
+AD_SOURCES_DIR = os.path.join(home_dir, ".config/hypr/adblock_sources")
+SETTINGS_FILE = os.path.join(home_dir, ".config/hypr/settings.json")
+# Can be pointed at a file:// or http://127.0.0.1 mirror for offline use and testing
+AD_SOURCE_URL = os.getenv("HYPRFOCUS_AD_SOURCE_URL", "https://raw.githubusercontent.com/StevenBlack/hosts/master/hosts")
+# Source registry (name -> URL). settings.json "ad_sources" replaces it when set.
+# We run as root for any user (sudoers), so user-supplied sources are limited
+# to these schemes: no file:// reads on their behalf.
+DEFAULT_AD_SOURCES = {"stevenblack": AD_SOURCE_URL}
+AD_SOURCE_SCHEMES = ("http", "https")
+MAX_FETCH_WORKERS = 8
 
-def clean_hosts(lines):
-    new_lines = []
-    skip_goal = False
-    skip_ads = False
-    
-    for line in lines:
-        # Goal Section
-        if START_MARKER in line:
-            skip_goal = True
-            continue
-        if END_MARKER in line:
-            skip_goal = False
-            continue
-            
-        # Ads Section
-        if ADS_START_MARKER in line:
-            skip_ads = True
-            continue
-        if ADS_END_MARKER in line:
-            skip_ads = False
-            continue
-            
-        if not skip_goal and not skip_ads:
-            new_lines.append(line)
-    return new_lines
+# Compiled ad cache: a short "#" header followed by sorted, deduplicated
+# "0.0.0.0 domain" lines. The body is copied verbatim into the hosts file and,
+# because every line shares the same prefix, can be binary searched on disk.
+COMPILED_MAGIC = "# HYPRFOCUS ADLIST v1"
+DOMAIN_RE = re.compile(r"^[a-z0-9_]([a-z0-9_-]{0,62}\.)+[a-z0-9_-]{1,63}$")
+IGNORED_HOSTS = {"localhost", "localhost.localdomain", "local", "broadcasthost",
+                 "ip6-localhost", "ip6-loopback", "ip6-localnet", "ip6-mcastprefix",
+                 "ip6-allnodes", "ip6-allrouters", "ip6-allhosts", "0.0.0.0"}
 
-def get_current_blocks(marker_start, marker_end):
-    # Reads the existing block from file to preserve it when modifying the other section
-    blocks = []
+# Blocking backend, from settings.json "block_backend":
+# "hosts" writes /etc/hosts, "dns" feeds the dns_sinkhole.py resolver instead
+DEFAULT_BACKEND = "hosts"
+RUN_DIR = "/run/hyprfocus"
+DNS_STATE_FILE = os.path.join(RUN_DIR, "dns_state.json")
+DNS_PID_FILE = os.path.join(RUN_DIR, "dns_sinkhole.pid")
+DNS_SINKHOLE_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "dns_sinkhole.py")
+# The dns backend only blocks anything once the system resolves through the sinkhole
+RESOLV_CONF = "/etc/resolv.conf"
+SINKHOLE_ADDR = "127.0.0.1"
+
+# Daemon mode: a root process started once via sudo that keeps the parsed
+# hosts file in memory and takes batched JSON commands on HOSTS_SOCKET
+# (protocol in hosts_client.py).
+
+# On-disk order of the managed layout. The goal section changes most often,
+# so it goes last. With the default atomic WRITE_MODE the whole file is
+# rewritten anyway; the order only pays off for "inplace" writes (and the
+# atomic fallback), which rewrite just the tail and leave the large ad
+# section in front of it untouched.
+SECTION_ORDER = ("header", "ads", "goal")
+
+# "atomic": build the new file next to the original, fsync it and rename it
+# into place, so resolvers only ever see the complete old or new file.
+# "inplace": truncate and rewrite only the changed tail (fewer bytes written,
+# but readers can observe a partially written file).
+WRITE_MODE = "atomic"
+
+def read_sections():
+    # Single pass over the hosts file. Returns the chunks in their on-disk order
+    # as (name, text) pairs, where name is "header", "goal" or "ads".
+    chunks = []
+    current = "header"
+    buf = []
+    
     try:
-        with open(HOSTS_PATH, 'r') as f:
-            lines = f.readlines()
-        
-        in_block = False
-        for line in lines:
-            if marker_start in line:
-                in_block = True
-                blocks.append(line)
-                continue
-            if marker_end in line:
-                in_block = False
-                blocks.append(line)
-                break
-            if in_block:
-                blocks.append(line)
-    except:
+        with open(HOSTS_PATH, 'r', newline='') as f:
+            for line in f:
+                if current == "header":
+                    if START_MARKER in line or ADS_START_MARKER in line:
+                        if buf:
+                            chunks.append(("header", "".join(buf)))
+                        current = "goal" if START_MARKER in line else "ads"
+                        buf = [line]
+                        continue
+                    buf.append(line)
+                else:
+                    buf.append(line)
+                    end_marker = END_MARKER if current == "goal" else ADS_END_MARKER
+                    if end_marker in line:
+                        chunks.append((current, "".join(buf)))
+                        current = "header"
+                        buf = []
+    except FileNotFoundError:
         pass
-    return blocks
+    
+    if buf:
+        # Unterminated section: keep it so the next write closes it properly
+        chunks.append((current, "".join(buf)))
+    return chunks
 
-def write_hosts(clean_lines, goal_lines, ad_lines):
-    # Ensure newline consistency
-    if clean_lines and not clean_lines[-1].endswith('\n'):
-        clean_lines[-1] += '\n'
-        
-    final_lines = clean_lines + goal_lines + ad_lines
+def get_section(chunks, name):
+    return "".join(text for chunk_name, text in chunks if chunk_name == name)
+
+def build_layout(chunks, goal=None, ads=None):
+    # Computes the new chunk list. Sections passed as None are kept as they are.
+    header = get_section(chunks, "header")
+    if header and not header.endswith('\n'):
+        header += '\n'
+    
+    sections = {
+        "header": header,
+        "goal": get_section(chunks, "goal") if goal is None else goal,
+        "ads": get_section(chunks, "ads") if ads is None else ads,
+    }
+    return [(name, sections[name]) for name in SECTION_ORDER if sections[name]]
+
+def write_sections(old_chunks, new_chunks):
+    # Atomic mode replaces the whole file; in-place mode (also the fallback when
+    # /etc/hosts can't be renamed over) rewrites from the first chunk that differs.
+    # Returns False without touching the file when nothing changed.
+    offset = 0
+    i = 0
+    while i < len(old_chunks) and i < len(new_chunks) and old_chunks[i] == new_chunks[i]:
+        offset += len(old_chunks[i][1].encode('utf-8'))
+        i += 1
+    
+    if i == len(old_chunks) and i == len(new_chunks):
+        return False
     
     try:
-        with open(HOSTS_PATH, 'w') as f:
-            f.writelines(final_lines)
+        if WRITE_MODE == "atomic":
+            try:
+                write_atomic(new_chunks)
+                return True
+            except OSError as e:
+                # /etc/hosts is bind-mounted in some containers and cannot be replaced
+                if e.errno not in (errno.EBUSY, errno.EXDEV):
+                    raise
+        write_inplace(offset, new_chunks[i:])
     except Exception as e:
         print(f"Error writing hosts: {e}")
         sys.exit(1)
+    return True
 
-def apply_goal_blocks(domains):
+def write_inplace(offset, chunks):
+    tail = "".join(text for _, text in chunks).encode('utf-8')
+    with open(HOSTS_PATH, 'r+b') as f:
+        f.seek(offset)
+        f.write(tail)
+        f.truncate()
+
+def write_atomic(chunks):
+    # Resolve symlinks so we replace the real file, not the link
+    target = os.path.realpath(HOSTS_PATH)
+    target_dir = os.path.dirname(target)
+    
+    fd, tmp_path = tempfile.mkstemp(prefix=".hosts.", dir=target_dir)
     try:
-        with open(HOSTS_PATH, 'r') as f:
-            lines = f.readlines()
-        
-        clean_lines = clean_hosts(lines)
-        ad_lines = get_current_blocks(ADS_START_MARKER, ADS_END_MARKER)
+        with os.fdopen(fd, 'wb') as f:
+            for _, text in chunks:
+                f.write(text.encode('utf-8'))
+            f.flush()
+            
+            # Keep the original owner and mode (mkstemp creates 0600)
+            try:
+                st = os.stat(target)
+                os.fchmod(f.fileno(), st.st_mode & 0o7777)
+                if os.getuid() == 0:
+                    os.fchown(f.fileno(), st.st_uid, st.st_gid)
+            except FileNotFoundError:
+                os.fchmod(f.fileno(), 0o644)
+            
+            os.fsync(f.fileno())
         
-        goal_lines = [START_MARKER + "\n"]
-        for domain in domains:
-            domain = domain.strip()
+        os.replace(tmp_path, target)
+    except:
+        try: os.remove(tmp_path)
+        except: pass
+        raise
+    
+    # Persist the rename itself
+    dir_fd = os.open(target_dir, os.O_RDONLY)
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
+
+# Parsed chunks kept between calls (daemon mode), keyed by the file's identity
+# so edits made by anyone else force a re-read
+_hosts_cache = {"key": None, "chunks": None}
+
+def hosts_file_key():
+    try:
+        st = os.stat(HOSTS_PATH)
+        return (st.st_ino, st.st_size, st.st_mtime_ns)
+    except FileNotFoundError:
+        return None
+
+def load_sections():
+    key = hosts_file_key()
+    if key is not None and key == _hosts_cache["key"]:
+        return _hosts_cache["chunks"]
+    chunks = read_sections()
+    _hosts_cache.update(key=key, chunks=chunks)
+    return chunks
+
+def update_hosts(goal=None, ads=None):
+    chunks = load_sections()
+    new_chunks = build_layout(chunks, goal=goal, ads=ads)
+    changed = write_sections(chunks, new_chunks)
+    if changed:
+        _hosts_cache.update(key=hosts_file_key(), chunks=new_chunks)
+    return changed
+
+def split_wildcards(domains):
+    # "*.youtube.com" rules cover the domain and every subdomain. They are kept
+    # apart from plain domains because a hosts file cannot express them.
+    plain, wildcards = [], []
+    for domain in domains:
+        domain = domain.strip()
+        if domain.startswith("*."):
+            suffix = normalize_domain(domain[2:])
+            if suffix:
+                wildcards.append(suffix)
+        elif domain:
+            # Validation also keeps stray whitespace/newlines out of the hosts file
+            domain = normalize_domain(domain)
             if domain:
-                if domain.startswith("www."):
-                    clean_domain = domain[4:]
-                    goal_lines.append(f"{REDIRECT_IP} {clean_domain}\n")
-                    goal_lines.append(f"{REDIRECT_IP} {domain}\n")
-                else:
-                    goal_lines.append(f"{REDIRECT_IP} {domain}\n")
-                    goal_lines.append(f"{REDIRECT_IP} www.{domain}\n")
-        goal_lines.append(END_MARKER + "\n")
-        
-        write_hosts(clean_lines, goal_lines, ad_lines)
-        print(f"Blocked {len(domains)} goal domains.")
+                plain.append(domain)
+    return plain, wildcards
+
+def render_goal_section(domains):
+    plain, wildcards = split_wildcards(domains)
+    if wildcards:
+        # Only the apex and www. can be listed here; subdomains need the dns backend
+        print(f"{len(wildcards)} wildcard rule(s): subdomains are only blocked with the dns backend.")
+    
+    goal_lines = [START_MARKER + "\n"]
+    for domain in plain + wildcards:
+        if domain.startswith("www."):
+            clean_domain = domain[4:]
+            goal_lines.append(f"{REDIRECT_IP} {clean_domain}\n")
+            goal_lines.append(f"{REDIRECT_IP} {domain}\n")
+        else:
+            goal_lines.append(f"{REDIRECT_IP} {domain}\n")
+            goal_lines.append(f"{REDIRECT_IP} www.{domain}\n")
+    goal_lines.append(END_MARKER + "\n")
+    return "".join(goal_lines)
+
+def render_ads_section():
+    body = read_compiled_body()
+    return ADS_START_MARKER + "\n" + body + ADS_END_MARKER + "\n"
+
+def load_settings():
+    try:
+        with open(SETTINGS_FILE, 'r') as f:
+            return json.load(f)
+    except:
+        return {}
+
+def get_backend():
+    backend = load_settings().get("block_backend", DEFAULT_BACKEND)
+    return backend if backend in ("hosts", "dns") else DEFAULT_BACKEND
+
+def sinkhole_is_resolver():
+    # True if the first nameserver in resolv.conf is the sinkhole
+    try:
+        with open(RESOLV_CONF, 'r') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[0] == "nameserver":
+                    return parts[1] == SINKHOLE_ADDR
+    except OSError:
+        pass
+    return False
+
+def use_dns_backend():
+    # The dns backend is only used when the sinkhole actually resolves for the
+    # system; otherwise dropping the hosts sections would turn blocking off
+    if get_backend() != "dns":
+        return False
+    if sinkhole_is_resolver():
+        return True
+    print(f"block_backend is dns but {RESOLV_CONF} doesn't use {SINKHOLE_ADDR}; blocking via /etc/hosts.")
+    return False
+
+def goal_domain_names(domains):
+    # Same name expansion as render_goal_section: bare domain plus www.
+    names = []
+    for domain in domains:
+        domain = normalize_domain(domain)
+        if domain:
+            bare = domain[4:] if domain.startswith("www.") else domain
+            names.extend([bare, "www." + bare])
+    return names
+
+def read_dns_state():
+    try:
+        with open(DNS_STATE_FILE, 'r') as f:
+            return json.load(f)
+    except:
+        return {"goal": [], "ads": False}
+
+def sinkhole_pid():
+    # PID of a live sinkhole from DNS_PID_FILE, or None (a stale pid may belong
+    # to an unrelated process by now)
+    try:
+        with open(DNS_PID_FILE, 'r') as f:
+            pid = int(f.read().strip())
+        with open(f"/proc/{pid}/cmdline", 'rb') as f:
+            return pid if b"dns_sinkhole" in f.read() else None
+    except (OSError, ValueError):
+        return None
+
+def start_sinkhole():
+    subprocess.Popen([sys.executable, DNS_SINKHOLE_SCRIPT],
+                     stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True)
+
+def signal_sinkhole():
+    # SIGHUP makes a running sinkhole reload the state; start one otherwise
+    pid = sinkhole_pid()
+    if pid is not None:
+        try:
+            os.kill(pid, signal.SIGHUP)
+            return
+        except OSError:
+            pass
+    start_sinkhole()
+
+def update_dns_state(goal=None, goal_wildcards=None, ads=None):
+    state = read_dns_state()
+    new_state = dict(state)
+    if goal is not None:
+        new_state["goal"] = goal
+    if goal_wildcards is not None:
+        new_state["goal_wildcards"] = goal_wildcards
+    if ads is not None:
+        new_state["ads"] = ads
+    new_state["ads_file"] = AD_COMPILED_FILE
+    if new_state == state:
+        # Nothing to reload, but the sinkhole may have died (crash, or a reboot
+        # that kept /run) while resolv.conf still points at it
+        if sinkhole_pid() is None:
+            start_sinkhole()
+        return False
+    
+    os.makedirs(RUN_DIR, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=".dns_state.", dir=RUN_DIR)
+    with os.fdopen(fd, 'w') as f:
+        json.dump(new_state, f)
+    os.chmod(tmp_path, 0o644)
+    os.replace(tmp_path, DNS_STATE_FILE)
+    signal_sinkhole()
+    return True
+
+def apply_goal_blocks(domains):
+    try:
+        if use_dns_backend():
+            # Drop any hosts section left over from the hosts backend
+            update_hosts(goal="")
+            plain, wildcards = split_wildcards(domains)
+            changed = update_dns_state(goal=goal_domain_names(plain), goal_wildcards=wildcards)
+        else:
+            changed = update_hosts(goal=render_goal_section(domains))
+        if changed:
+            print(f"Blocked {len(domains)} goal domains.")
+        else:
+            print(f"Goal blocks unchanged ({len(domains)} domains).")
+        return changed
         
     except Exception as e:
         print(f"Error: {e}")
         sys.exit(1)
 
-def update_ad_cache():
-    print("Downloading ad blocklist...")
+def normalize_domain(name):
+    name = name.strip().lower().rstrip('.')
+    if name in IGNORED_HOSTS or not DOMAIN_RE.match(name):
+        return None
+    return name
+
+def parse_hosts_line(line):
+    # Returns the domains a hosts-format line blocks, [] for comments/junk
+    line = line.split('#', 1)[0].strip()
+    if not line:
+        return []
+    parts = line.split()
+    if len(parts) < 2 or parts[0] not in ("0.0.0.0", "127.0.0.1", "::", "::1"):
+        return []
+    domains = []
+    for part in parts[1:]:
+        domain = normalize_domain(part)
+        if domain:
+            domains.append(domain)
+    return domains
+
+def compile_ad_cache(lines, source_hash):
+    domains = set()
+    for line in lines:
+        domains.update(parse_hosts_line(line))
+    return write_compiled_cache(domains, source_hash)
+
+def write_compiled_cache(domains, source_hash, path=None):
+    # domains may be any iterable; it is sorted and deduplicated here
+    return write_sorted_cache(sorted(set(domains)), source_hash, path)
+
+def write_sorted_cache(ordered, source_hash, path=None):
+    path = path or AD_COMPILED_FILE
+    header = [COMPILED_MAGIC, f"# count={len(ordered)}", f"# source_sha256={source_hash}"]
+    body = "".join(f"{BLOCK_IP} {domain}\n" for domain in ordered)
+    
+    fd, tmp_path = tempfile.mkstemp(prefix=".adblock.", dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write("\n".join(header) + "\n")
+            f.write(body)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except:
+        try: os.remove(tmp_path)
+        except: pass
+        raise
+    return len(ordered)
+
+def compile_from_raw_cache():
+    # Builds the compiled cache from the plain adblock_list.txt shipped with the ISO
+    with open(AD_CACHE_FILE, 'rb') as f:
+        raw = f.read()
+    text = raw.decode('utf-8', errors='replace')
+    return compile_ad_cache(text.splitlines(), hashlib.sha256(raw).hexdigest())
+
+def read_compiled_header(f):
+    # Consumes the header from an open compiled cache (binary mode).
+    # Returns (metadata dict, offset of the first domain line).
+    meta = {}
+    first = f.readline().decode('utf-8').rstrip('\n')
+    if first != COMPILED_MAGIC:
+        raise ValueError("not a compiled ad cache")
+    while True:
+        pos = f.tell()
+        line = f.readline()
+        if not line.startswith(b"#"):
+            f.seek(pos)
+            return meta, pos
+        key, _, value = line.decode('utf-8')[1:].strip().partition('=')
+        meta[key] = value
+
+def ensure_compiled_cache():
+    if os.path.exists(AD_COMPILED_FILE):
+        return True
+    try:
+        if os.path.exists(AD_CACHE_FILE):
+            print("Compiling ad cache...")
+            compile_from_raw_cache()
+        else:
+            print("Ad cache not found. Updating...")
+            update_ad_cache()
+    except Exception as e:
+        print(f"Failed to compile ad cache: {e}")
+    return os.path.exists(AD_COMPILED_FILE)
+
+def read_compiled_body():
+    if not ensure_compiled_cache():
+        print("Error reading ad cache")
+        return ""
     try:
-        with urllib.request.urlopen(AD_SOURCE_URL) as response:
-            data = response.read().decode('utf-8')
+        with open(AD_COMPILED_FILE, 'rb') as f:
+            read_compiled_header(f)
+            return f.read().decode('utf-8')
+    except Exception as e:
+        print(f"Error reading ad cache: {e}")
+        return ""
+
+def is_ad_domain(domain):
+    # Binary search over the sorted lines of the compiled cache: O(log n) seeks
+    domain = normalize_domain(domain)
+    if not domain or not ensure_compiled_cache():
+        return False
+    target = f"{BLOCK_IP} {domain}".encode('utf-8')
+    
+    with open(AD_COMPILED_FILE, 'rb') as f:
+        _, lo = read_compiled_header(f)
+        hi = os.fstat(f.fileno()).st_size
         
-        # Process lines: extract only 0.0.0.0 entries, ignore localhost
-        valid_lines = []
-        for line in data.splitlines():
-            line = line.strip()
-            if line.startswith("0.0.0.0") and not line.startswith("0.0.0.0 0.0.0.0"):
-                valid_lines.append(line + "\n")
+        # Invariant: lo is a line start and a matching line starts in [lo, hi)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if mid > lo:
+                f.seek(mid - 1)
+                f.readline()  # advance to the first line starting at or after mid
+            else:
+                f.seek(lo)
+            line_start = f.tell()
+            if line_start >= hi:
+                hi = mid
+                continue
+            
+            line = f.readline().rstrip(b"\n")
+            if line == target:
+                return True
+            if line < target:
+                lo = f.tell()
+            else:
+                hi = line_start
+    return False
+
+def load_ad_meta():
+    try:
+        with open(AD_META_FILE, 'r') as f:
+            return json.load(f)
+    except:
+        return {}
+
+def save_ad_meta(meta):
+    # Temp file + rename: the directory belongs to the user, so never open a
+    # path in it that could be a planted symlink
+    try:
+        fd, tmp_path = tempfile.mkstemp(prefix=".adblock_meta.", dir=os.path.dirname(AD_META_FILE))
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(meta, f, indent=4)
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, AD_META_FILE)
+        except:
+            try: os.remove(tmp_path)
+            except: pass
+            raise
+    except Exception as e:
+        print(f"Failed to save adlist metadata: {e}")
+
+def load_ad_sources():
+    try:
+        with open(SETTINGS_FILE, 'r') as f:
+            sources = json.load(f).get("ad_sources")
+        if isinstance(sources, dict) and sources:
+            allowed = {}
+            for name, url in sources.items():
+                if not url:
+                    continue
+                if not isinstance(url, str) or urllib.parse.urlsplit(url).scheme not in AD_SOURCE_SCHEMES:
+                    print(f"Skipping ad source {name}: only http(s) URLs are allowed")
+                    continue
+                allowed[name] = url
+            return allowed
+    except:
+        pass
+    return dict(DEFAULT_AD_SOURCES)
+
+def source_cache_path(name):
+    safe_name = re.sub(r"[^A-Za-z0-9_.-]", "_", name)
+    return os.path.join(AD_SOURCES_DIR, safe_name + ".compiled")
+
+def iter_compiled_domains(path):
+    with open(path, 'rb') as f:
+        read_compiled_header(f)
+        for line in f:
+            yield line.decode('utf-8').split()[1]
+
+def fetch_ad_source(name, url, meta):
+    # Downloads one source into its own compiled cache. Returns a stats dict.
+    started = time.monotonic()
+    stats = {"name": name, "url": url, "status": "failed", "count": 0}
+    cache_path = source_cache_path(name)
+    
+    # Validators only count if they belong to this URL and the cache they describe still exists
+    if meta.get("url") != url or not os.path.exists(cache_path):
+        meta = {}
+    
+    request = urllib.request.Request(url)
+    if meta.get("etag"):
+        request.add_header("If-None-Match", meta["etag"])
+    if meta.get("last_modified"):
+        request.add_header("If-Modified-Since", meta["last_modified"])
+    
+    try:
+        with urllib.request.urlopen(request, timeout=30) as response:
+            etag = response.headers.get("ETag")
+            last_modified = response.headers.get("Last-Modified")
+            
+            # file:// and some mirrors ignore conditional headers; compare ourselves
+            if meta and (etag or last_modified) and \
+                    etag == meta.get("etag") and last_modified == meta.get("last_modified"):
+                stats.update(meta, status="unchanged")
+            else:
+                # Stream line by line: only the parsed domain set is kept in memory
+                digest = hashlib.sha256()
+                domains = set()
+                for raw_line in response:
+                    digest.update(raw_line)
+                    domains.update(parse_hosts_line(raw_line.decode('utf-8', errors='replace')))
                 
-        with open(AD_CACHE_FILE, 'w') as f:
-            f.writelines(valid_lines)
-        print(f"Adlist updated. {len(valid_lines)} rules saved.")
+                count = write_compiled_cache(domains, digest.hexdigest(), cache_path)
+                stats.update(status="updated", etag=etag, last_modified=last_modified,
+                             sha256=digest.hexdigest(), count=count)
+    except urllib.error.HTTPError as e:
+        if e.code == 304:
+            stats.update(meta, status="unchanged")
+        else:
+            stats["error"] = str(e)
+    except Exception as e:
+        stats["error"] = str(e)
+    
+    stats["url"] = url
+    stats["seconds"] = round(time.monotonic() - started, 3)
+    return stats
+
+def merge_source_caches(names):
+    # Each source cache is already sorted, so a k-way merge with adjacent
+    # dedup produces the combined list without building one big set.
+    # Returns None when the merged cache already covers exactly these sources.
+    paths = [source_cache_path(name) for name in names if os.path.exists(source_cache_path(name))]
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, 'rb') as f:
+            digest.update(str(read_compiled_header(f)[0].get("source_sha256")).encode())
+    
+    try:
+        with open(AD_COMPILED_FILE, 'rb') as f:
+            if read_compiled_header(f)[0].get("source_sha256") == digest.hexdigest():
+                return None
+    except:
+        pass
+    
+    merged = []
+    for domain in heapq.merge(*(iter_compiled_domains(path) for path in paths)):
+        if not merged or merged[-1] != domain:
+            merged.append(domain)
+    return write_sorted_cache(merged, digest.hexdigest())
+
+def update_ad_cache():
+    sources = load_ad_sources()
+    if not sources:
+        print("No ad blocklist sources enabled; keeping the current adlist.")
+        return
+    meta = load_ad_meta()
+    if "url" in meta:
+        meta = {}  # single-source format from older versions
+    os.makedirs(AD_SOURCES_DIR, exist_ok=True)
+    
+    print(f"Downloading {len(sources)} ad blocklist(s)...")
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=min(MAX_FETCH_WORKERS, len(sources))) as pool:
+        futures = [pool.submit(fetch_ad_source, name, url, meta.get(name, {}))
+                   for name, url in sources.items()]
+        results = [future.result() for future in futures]
+    
+    for stats in results:
+        line = f"  {stats['name']}: {stats['status']}, {stats['count']} domains in {stats['seconds']}s"
+        if stats.get("error"):
+            line += f" ({stats['error']})"
+        print(line)
+        if stats["status"] != "failed":
+            meta[stats["name"]] = {k: stats.get(k) for k in ("url", "etag", "last_modified", "sha256", "count")}
+    save_ad_meta(meta)
+    
+    if all(stats["status"] == "failed" for stats in results):
+        print("Failed to update adlist: no source could be fetched")
+        return
+    
+    try:
+        count = merge_source_caches(list(sources))
+        if count is None:
+            print("Adlist unchanged.")
+        else:
+            print(f"Adlist updated. {count} rules saved in {time.monotonic() - started:.2f}s.")
     except Exception as e:
         print(f"Failed to update adlist: {e}")
 
 def apply_ads(enable):
     try:
-        with open(HOSTS_PATH, 'r') as f:
-            lines = f.readlines()
-        
-        clean_lines = clean_hosts(lines)
-        goal_lines = get_current_blocks(START_MARKER, END_MARKER)
-        
-        ad_lines = []
-        if enable:
-            if not os.path.exists(AD_CACHE_FILE):
-                print("Ad cache not found. Updating...")
-                update_ad_cache()
-            
-            ad_lines.append(ADS_START_MARKER + "\n")
-            try:
-                with open(AD_CACHE_FILE, 'r') as f:
-                    ad_lines.extend(f.readlines())
-            except:
-                print("Error reading ad cache")
-            ad_lines.append(ADS_END_MARKER + "\n")
+        if use_dns_backend():
+            update_hosts(ads="")
+            if enable:
+                ensure_compiled_cache()
+            changed = update_dns_state(ads=enable)
+            print(f"Ad blocking {'ENABLED' if enable else 'DISABLED'}.")
+        elif enable:
+            changed = update_hosts(ads=render_ads_section())
             print("Ad blocking ENABLED.")
         else:
+            changed = update_hosts(ads="")
             print("Ad blocking DISABLED.")
+        return changed
+        
+    except Exception as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+def apply_profile(domains, ads_enabled):
+    # Session start: goal blocks and adblock state in a single read and write.
+    # Returns (changed, per-phase timings in ms).
+    timings = {}
+    started = time.monotonic()
+    try:
+        if use_dns_backend():
+            changed = update_hosts(goal="", ads="")
+            timings["hosts"] = round((time.monotonic() - started) * 1000, 1)
             
-        write_hosts(clean_lines, goal_lines, ad_lines)
+            started = time.monotonic()
+            plain, wildcards = split_wildcards(domains)
+            if ads_enabled:
+                ensure_compiled_cache()
+            changed = update_dns_state(goal=goal_domain_names(plain), goal_wildcards=wildcards, ads=ads_enabled) or changed
+            timings["dns"] = round((time.monotonic() - started) * 1000, 1)
+        else:
+            chunks = load_sections()
+            timings["read"] = round((time.monotonic() - started) * 1000, 1)
+            
+            started = time.monotonic()
+            goal = render_goal_section(domains)
+            ads = render_ads_section() if ads_enabled else ""
+            new_chunks = build_layout(chunks, goal=goal, ads=ads)
+            timings["render"] = round((time.monotonic() - started) * 1000, 1)
+            
+            started = time.monotonic()
+            changed = write_sections(chunks, new_chunks)
+            if changed:
+                _hosts_cache.update(key=hosts_file_key(), chunks=new_chunks)
+            timings["write"] = round((time.monotonic() - started) * 1000, 1)
+        
+        phases = ", ".join(f"{name} {ms}ms" for name, ms in timings.items())
+        state = "applied" if changed else "unchanged"
+        print(f"Profile {state}: {len(domains)} goal domains, ads {'on' if ads_enabled else 'off'} ({phases}).")
+        return changed, timings
         
     except Exception as e:
         print(f"Error: {e}")
         sys.exit(1)
 
+def run_command(command):
+    # Executes one daemon command. Failures are reported, never fatal to the daemon.
+    op = command.get("op")
+    timings = None
+    try:
+        if op == "profile":
+            domains = [d for d in command.get("domains", []) if isinstance(d, str)]
+            changed, timings = apply_profile(domains, bool(command.get("ads")))
+        elif op == "goal":
+            changed = apply_goal_blocks([d for d in command.get("domains", []) if isinstance(d, str)])
+        elif op == "clear":
+            changed = apply_goal_blocks([])
+        elif op == "ads":
+            changed = apply_ads(bool(command.get("enable")))
+        elif op == "ads_update":
+            update_ad_cache()
+            changed = True
+        elif op == "ping":
+            changed = False
+        else:
+            return {"op": op, "ok": False, "error": "unknown command"}
+    except SystemExit:
+        return {"op": op, "ok": False, "error": "command failed"}
+    except Exception as e:
+        return {"op": op, "ok": False, "error": str(e)}
+    result = {"op": op, "ok": True, "changed": changed}
+    if timings is not None:
+        result["timings"] = timings
+    return result
+
+class HostsRequestHandler(socketserver.StreamRequestHandler):
+    # One JSON request per line: {"commands": [{"op": ...}, ...]}
+    timeout = 10
+
+    def handle(self):
+        try:
+            request = json.loads(self.rfile.readline())
+            results = [run_command(command) for command in request.get("commands", [])]
+            reply = {"ok": all(r["ok"] for r in results), "results": results}
+        except Exception as e:
+            reply = {"ok": False, "error": str(e)}
+        self.wfile.write(encode_message(reply))
+
+def serve_daemon():
+    if hosts_request([{"op": "ping"}], timeout=2) is not None:
+        print("Hosts daemon already running.")
+        return
+    
+    os.makedirs(RUN_DIR, exist_ok=True)
+    try:
+        os.remove(HOSTS_SOCKET)
+    except FileNotFoundError:
+        pass
+    
+    # Only the user who started us (and root) may connect
+    old_umask = os.umask(0o077)
+    try:
+        server = socketserver.UnixStreamServer(HOSTS_SOCKET, HostsRequestHandler)
+    finally:
+        os.umask(old_umask)
+    if os.getenv("SUDO_UID"):
+        os.chown(HOSTS_SOCKET, int(os.getenv("SUDO_UID")), -1)
+    
+    load_sections()
+    print(f"Hosts daemon listening on {HOSTS_SOCKET}")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        try: os.remove(HOSTS_SOCKET)
+        except: pass
+
 if __name__ == "__main__":
     if len(sys.argv) < 2:
-        print("Usage: hosts_manager.py [clear|ads on|ads off|ads update|domain1,domain2...]")
+        print("Usage: hosts_manager.py [clear|daemon|profile on|off [domains]|ads on|ads off|ads update|ads check DOMAIN|domain1,domain2...]")
         sys.exit(1)
         
     arg = sys.argv[1]
     
     if arg == "clear":
         apply_goal_blocks([])
+    elif arg == "profile":
+        if len(sys.argv) < 3 or sys.argv[2] not in ("on", "off"):
+            print("Usage: profile [on|off] [domain1,domain2...]")
+            sys.exit(1)
+        domains = sys.argv[3].split(',') if len(sys.argv) > 3 else []
+        apply_profile(domains, sys.argv[2] == "on")
+    elif arg == "daemon":
+        try:
+            serve_daemon()
+        except KeyboardInterrupt:
+            pass
     elif arg == "ads":
         if len(sys.argv) < 3:
-            print("Usage: ads [on|off|update]")
+            print("Usage: ads [on|off|update|check DOMAIN]")
         else:
             sub = sys.argv[2]
             if sub == "on": apply_ads(True)
             elif sub == "off": apply_ads(False)
             elif sub == "update": update_ad_cache()
+            elif sub == "check" and len(sys.argv) > 3:
+                blocked = is_ad_domain(sys.argv[3])
+                print("blocked" if blocked else "not blocked")
+                sys.exit(0 if blocked else 1)
     else:
         domains = arg.split(',')
         apply_goal_blocks(domains)
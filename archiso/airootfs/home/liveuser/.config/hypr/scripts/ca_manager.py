@@ -1,15 +1,56 @@
 #!/usr/bin/env python3
 import os
 import sys
+import re
 import subprocess
+import tempfile
+import hashlib
 import json
+import time
+import datetime
+import threading
+import collections
 
-CERTS_DIR = os.path.expanduser("~/.config/hypr/scripts/certs")
+# Optional: sign in-process instead of spawning openssl for every certificate
+try:
+    from cryptography import x509
+    from cryptography.x509.oid import NameOID, ExtendedKeyUsageOID
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import ec, rsa
+    HAVE_CRYPTOGRAPHY = True
+except ImportError:
+    HAVE_CRYPTOGRAPHY = False
+
+# Determine Home Directory (Sudo-aware), so redirect_server.py running under
+# sudo finds the same CA as the user
+if os.getuid() == 0 and os.getenv("SUDO_USER"):
+    home_dir = os.path.expanduser(f"~{os.getenv('SUDO_USER')}")
+else:
+    home_dir = os.path.expanduser("~")
+
+CERTS_DIR = os.path.join(home_dir, ".config/hypr/scripts/certs")
 CA_KEY = os.path.join(CERTS_DIR, "myCA.key")
 CA_CERT = os.path.join(CERTS_DIR, "myCA.pem")
 SERVER_KEY = os.path.join(CERTS_DIR, "server.key")
 SERVER_CERT = os.path.join(CERTS_DIR, "server.pem") # This will be Key + Cert bundle
-CONFIG_FILE = os.path.join(CERTS_DIR, "openssl.cnf")
+# What the current server cert(s) cover: SANs, expiry and key fingerprint per chunk
+MANIFEST_FILE = os.path.join(CERTS_DIR, "server.manifest.json")
+# Large domain lists are split over several certs (server.pem, server-1.pem, ...)
+MAX_SANS_PER_CERT = 100
+# Reissue anything that expires within this window
+RENEW_BEFORE = 7 * 24 * 3600
+
+# Per-host leaf certs minted on demand for SNI (key + cert bundles)
+HOST_CERTS_DIR = os.path.join(CERTS_DIR, "hosts")
+HOST_CERT_DAYS = 365
+MAX_HOST_CERTS = 512
+HOSTNAME_RE = re.compile(r"^[a-z0-9_]([a-z0-9_-]{0,62}\.)*[a-z0-9_-]{1,63}$")
+
+# Leaf key type: "ec" (P-256, near-instant keygen) or "rsa" (2048-bit)
+KEY_TYPE = os.getenv("HYPRFOCUS_CERT_KEY_TYPE", "ec")
+SERVER_CERT_DAYS = 365
+# Keys generated ahead of time by a background thread in long-running callers
+KEY_POOL_SIZE = 8
 
 def run_cmd(cmd):
     subprocess.run(cmd, shell=True, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
@@ -29,61 +70,292 @@ def setup_ca():
         run_cmd(f"openssl req -x509 -new -nodes -key {CA_KEY} -sha256 -days 3650 -out {CA_CERT} -subj '/C=US/ST=Focus/L=OS/O=HyprFocus Root/CN=HyprFocus CA'")
         print(f"\nIMPORTANT: You must trust this CA: {CA_CERT}\n")
 
-def generate_server_cert(domains):
+def generate_key_pem(key_type=None):
+    # PEM (PKCS#8) private key of the configured type
+    key_type = key_type or KEY_TYPE
+    if HAVE_CRYPTOGRAPHY:
+        if key_type == "rsa":
+            key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        else:
+            key = ec.generate_private_key(ec.SECP256R1())
+        return key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption())
+
+    if key_type == "rsa":
+        cmd = ["openssl", "genpkey", "-algorithm", "RSA", "-pkeyopt", "rsa_keygen_bits:2048"]
+    else:
+        cmd = ["openssl", "genpkey", "-algorithm", "EC", "-pkeyopt", "ec_paramgen_curve:P-256"]
+    return subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL).stdout
+
+class KeyPool:
+    # Keys generated ahead of time so issuing a certificate never waits on
+    # keygen. start() refills in a daemon thread; take() generates inline
+    # when the pool is empty (or was never started, e.g. one-shot CLI runs).
+    def __init__(self, size=KEY_POOL_SIZE):
+        self.size = size
+        self.keys = collections.deque()
+        self.wanted = threading.Event()
+        self.thread = None
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.fill, daemon=True)
+            self.thread.start()
+        self.wanted.set()
+
+    def fill(self):
+        while True:
+            self.wanted.wait()
+            self.wanted.clear()
+            while len(self.keys) < self.size:
+                try:
+                    self.keys.append(generate_key_pem())
+                except Exception as e:
+                    print(f"Key pool refill failed: {e}")
+                    break
+
+    def take(self):
+        try:
+            key_pem = self.keys.popleft()
+        except IndexError:
+            key_pem = None
+        if self.thread is not None:
+            self.wanted.set()
+        return key_pem or generate_key_pem()
+
+key_pool = KeyPool()
+
+_ca_cache = {}
+
+def load_ca():
+    # Parsed CA key + cert, reused across issuances until either file changes
+    stamp = (CA_KEY, os.stat(CA_KEY).st_mtime_ns, CA_CERT, os.stat(CA_CERT).st_mtime_ns)
+    if _ca_cache.get("stamp") != stamp:
+        with open(CA_KEY, 'rb') as f:
+            ca_key = serialization.load_pem_private_key(f.read(), password=None)
+        with open(CA_CERT, 'rb') as f:
+            ca_cert = x509.load_pem_x509_certificate(f.read())
+        _ca_cache.update(stamp=stamp, key=ca_key, cert=ca_cert)
+    return _ca_cache["key"], _ca_cache["cert"]
+
+def sign_leaf(names, key_pem, days):
+    # Returns a PEM certificate for key_pem covering names, signed by the local CA
+    common_name = names[0] if len(names[0]) <= 64 else "FocusMode"
+    if HAVE_CRYPTOGRAPHY:
+        ca_key, ca_cert = load_ca()
+        key = serialization.load_pem_private_key(key_pem, password=None)
+        now = datetime.datetime.now(datetime.timezone.utc)
+        cert = (x509.CertificateBuilder()
+                .subject_name(x509.Name([x509.NameAttribute(NameOID.ORGANIZATION_NAME, "HyprFocus"),
+                                         x509.NameAttribute(NameOID.COMMON_NAME, common_name)]))
+                .issuer_name(ca_cert.subject)
+                .public_key(key.public_key())
+                .serial_number(x509.random_serial_number())
+                .not_valid_before(now - datetime.timedelta(minutes=5))
+                .not_valid_after(now + datetime.timedelta(days=days))
+                .add_extension(x509.SubjectAlternativeName([x509.DNSName(name) for name in names]), critical=False)
+                .add_extension(x509.BasicConstraints(ca=False, path_length=None), critical=True)
+                .add_extension(x509.ExtendedKeyUsage([ExtendedKeyUsageOID.SERVER_AUTH]), critical=False)
+                .sign(ca_key, hashes.SHA256()))
+        return cert.public_bytes(serialization.Encoding.PEM)
+
+    # Fallback: a single openssl call, SANs on the command line (OpenSSL 3)
+    fd, key_path = tempfile.mkstemp(dir=CERTS_DIR, suffix=".key")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(key_pem)
+        result = subprocess.run([
+            "openssl", "req", "-x509", "-new", "-key", key_path,
+            "-days", str(days), "-sha256",
+            "-subj", f"/O=HyprFocus/CN={common_name}",
+            "-addext", "subjectAltName=" + ",".join(f"DNS:{name}" for name in names),
+            "-addext", "basicConstraints=critical,CA:FALSE",
+            "-addext", "extendedKeyUsage=serverAuth",
+            "-CA", CA_CERT, "-CAkey", CA_KEY,
+        ], check=True, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    finally:
+        os.remove(key_path)
+    return result.stdout
+
+def write_bundle(path, key_pem, cert_pem, mode=None):
+    # Key + cert in one file for ssl.load_cert_chain, swapped in atomically
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(key_pem)
+        f.write(cert_pem)
+    if mode is not None:
+        os.chmod(tmp_path, mode)
+    os.replace(tmp_path, path)
+
+def key_fingerprint(key_pem):
+    return hashlib.sha256(key_pem).hexdigest()
+
+def load_manifest():
+    try:
+        with open(MANIFEST_FILE, 'r') as f:
+            manifest = json.load(f)
+        if isinstance(manifest.get("certs"), list):
+            return manifest
+    except: pass
+    return {"key_fingerprint": None, "certs": []}
+
+def save_manifest(manifest):
+    tmp_path = MANIFEST_FILE + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, MANIFEST_FILE)
+
+def name_covered(name, names):
+    # Exact SAN match, or a *.parent wildcard covering a single extra label
+    if name in names:
+        return True
+    parent = name.split('.', 1)[1] if '.' in name else None
+    return parent is not None and f"*.{parent}" in names
+
+def manifest_covers(manifest, names, key_pem):
+    # True when every name is already in a cert signed for this key that isn't
+    # about to expire, so there is nothing to reissue
+    if manifest.get("key_fingerprint") != key_fingerprint(key_pem):
+        return False
+    deadline = time.time() + RENEW_BEFORE
+    covered = set()
+    for entry in manifest["certs"]:
+        if entry.get("not_after", 0) < deadline or not os.path.exists(os.path.join(CERTS_DIR, entry.get("file", ""))):
+            return False
+        covered.update(entry.get("names", []))
+    return all(name_covered(name, covered) for name in names)
+
+def chunk_cert_file(index):
+    return os.path.basename(SERVER_CERT) if index == 0 else f"server-{index}.pem"
+
+def generate_server_cert(domains, force=False):
     setup_ca()
     
     if not domains:
         domains = ["localhost"]
 
-    # 1. Generate Server Key if missing (reusable)
-    if not os.path.exists(SERVER_KEY):
-        run_cmd(f"openssl genrsa -out {SERVER_KEY} 2048")
+    # 1. Reuse the server key across goal changes; only the cert is reissued
+    try:
+        with open(SERVER_KEY, 'rb') as f:
+            key_pem = f.read()
+    except FileNotFoundError:
+        key_pem = key_pool.take()
+        with open(SERVER_KEY, 'wb') as f:
+            f.write(key_pem)
+
+    # 2. SANs, also with the www prefix (a *.domain entry already covers it)
+    names = []
+    for domain in domains:
+        names.append(domain)
+        if not domain.startswith("www.") and not domain.startswith("*."):
+            names.append(f"www.{domain}")
+    names = list(dict.fromkeys(names))
 
-    # 2. Create OpenSSL Config for SANs
+    old_manifest = load_manifest()
+    if not force and manifest_covers(old_manifest, names, key_pem):
+        print(f"Certificate already covers: {', '.join(domains)}")
+        return False
+
+    # 3. Sign with the Root CA and bundle Key + Cert for the Python server,
+    #    keeping each cert's SAN list small enough for a fast handshake
     print(f"Generating certificate for: {', '.join(domains)}")
-    with open(CONFIG_FILE, 'w') as f:
-        f.write("[req]\n")
-        f.write("default_bits = 2048\n")
-        f.write("prompt = no\n")
-        f.write("default_md = sha256\n")
-        f.write("distinguished_name = dn\n")
-        f.write("req_extensions = req_ext\n")
-        f.write("\n[dn]\n")
-        f.write("C=US\nST=Focus\nL=Land\nO=HyprFocus\nCN=FocusMode\n")
-        f.write("\n[req_ext]\n")
-        f.write("subjectAltName = @alt_names\n")
-        f.write("\n[alt_names]\n")
-        for i, domain in enumerate(domains):
-            f.write(f"DNS.{i+1} = {domain}\n")
-            # Also add www prefix if not present
-            if not domain.startswith("www."):
-                f.write(f"DNS.{i+1000} = www.{domain}\n")
-
-    # 3. Generate CSR
-    csr_path = os.path.join(CERTS_DIR, "server.csr")
-    run_cmd(f"openssl req -new -key {SERVER_KEY} -out {csr_path} -config {CONFIG_FILE}")
-
-    # 4. Sign CSR with Root CA
-    srv_crt_path = os.path.join(CERTS_DIR, "server.crt")
-    run_cmd(f"openssl x509 -req -in {csr_path} -CA {CA_CERT} -CAkey {CA_KEY} -CAcreateserial -out {srv_crt_path} -days 365 -sha256 -extensions req_ext -extfile {CONFIG_FILE}")
-
-    # 5. Bundle Key + Cert for Python Server
-    with open(SERVER_CERT, 'w') as f_out:
-        with open(SERVER_KEY, 'r') as f_key:
-            f_out.write(f_key.read())
-        with open(srv_crt_path, 'r') as f_crt:
-            f_out.write(f_crt.read())
-            
-    # Cleanup intermediate files
+    manifest = {"key_fingerprint": key_fingerprint(key_pem), "certs": []}
+    for index in range(0, len(names), MAX_SANS_PER_CERT):
+        chunk = names[index:index + MAX_SANS_PER_CERT]
+        cert_file = chunk_cert_file(index // MAX_SANS_PER_CERT)
+        not_after = int(time.time()) + SERVER_CERT_DAYS * 86400
+        write_bundle(os.path.join(CERTS_DIR, cert_file), key_pem, sign_leaf(chunk, key_pem, SERVER_CERT_DAYS))
+        manifest["certs"].append({"file": cert_file, "names": chunk, "not_after": not_after})
+    save_manifest(manifest)
+
+    # Drop chunks left over from a longer list
+    current = set(entry["file"] for entry in manifest["certs"])
+    for entry in old_manifest["certs"]:
+        if entry.get("file") not in current:
+            try: os.remove(os.path.join(CERTS_DIR, os.path.basename(entry.get("file", ""))))
+            except: pass
+    return True
+
+_manifest_cache = {}
+
+def find_server_cert(hostname):
+    # Path of the server cert chunk whose SANs cover hostname, or None.
+    # The manifest is re-read only when it changes on disk.
     try:
-        os.remove(csr_path)
-        os.remove(srv_crt_path)
-        os.remove(CONFIG_FILE)
-    except: pass
+        mtime = os.stat(MANIFEST_FILE).st_mtime_ns
+    except OSError:
+        return None
+    if _manifest_cache.get("mtime") != mtime:
+        index = {}
+        for entry in load_manifest()["certs"]:
+            if entry.get("not_after", 0) < time.time():
+                continue
+            for name in entry.get("names", []):
+                index.setdefault(name, os.path.join(CERTS_DIR, os.path.basename(entry.get("file", ""))))
+        _manifest_cache.update(mtime=mtime, index=index)
+    index = _manifest_cache["index"]
+    hostname = hostname.lower().rstrip('.')
+    if hostname in index:
+        return index[hostname]
+    parent = hostname.split('.', 1)[1] if '.' in hostname else None
+    return index.get(f"*.{parent}") if parent else None
+
+def host_cert_path(hostname):
+    return os.path.join(HOST_CERTS_DIR, f"{hostname}.pem")
+
+def prune_host_certs():
+    # Keep the on-disk cache bounded: drop the least recently used bundles
+    try:
+        entries = [os.path.join(HOST_CERTS_DIR, name) for name in os.listdir(HOST_CERTS_DIR) if name.endswith(".pem")]
+    except OSError:
+        return
+    if len(entries) <= MAX_HOST_CERTS:
+        return
+    entries.sort(key=lambda path: os.stat(path).st_atime)
+    for path in entries[:len(entries) - MAX_HOST_CERTS]:
+        try: os.remove(path)
+        except: pass
+
+def existing_host_cert(hostname):
+    # Path of an already minted, not yet due for renewal bundle for hostname, or None
+    hostname = hostname.lower().rstrip('.')
+    if not HOSTNAME_RE.match(hostname):
+        return None
+    path = host_cert_path(hostname)
+    try:
+        if time.time() - os.stat(path).st_mtime < HOST_CERT_DAYS * 86400 - RENEW_BEFORE:
+            return path
+    except FileNotFoundError:
+        pass
+    return None
+
+def issue_host_cert(hostname):
+    # Returns the path of a key + cert bundle for hostname signed by the local CA,
+    # minting it if missing or close to expiry. Returns None if it can't be issued.
+    hostname = hostname.lower().rstrip('.')
+    if not HOSTNAME_RE.match(hostname) or not os.path.exists(CA_KEY) or not os.path.exists(CA_CERT):
+        return None
+    
+    path = existing_host_cert(hostname)
+    if path:
+        return path
+    path = host_cert_path(hostname)
+    
+    try:
+        os.makedirs(HOST_CERTS_DIR, exist_ok=True)
+        key_pem = key_pool.take()
+        write_bundle(path, key_pem, sign_leaf([hostname], key_pem, HOST_CERT_DAYS), 0o600)
+    except Exception as e:
+        print(f"Failed to issue certificate for {hostname}: {e}")
+        try: os.remove(path + ".tmp")
+        except: pass
+        return None
+    
+    prune_host_certs()
+    return path
 
 if __name__ == "__main__":
     if len(sys.argv) > 1:
         domains = sys.argv[1].split(',')
-        generate_server_cert(domains)
+        generate_server_cert(domains, force="--force" in sys.argv[2:])
     else:
         setup_ca()
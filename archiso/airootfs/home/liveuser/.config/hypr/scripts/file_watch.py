@@ -0,0 +1,96 @@
+import ctypes
+import os
+import select
+import struct
+import time
+
+# inotify(7) constants
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_EVENT_HEADER = struct.Struct("iIII")
+
+# Used when inotify isn't available (e.g. no libc symbol, watch limit reached)
+POLL_INTERVAL = 2
+
+class FileWatch:
+    # Waits for whole-file updates (close after write, or rename into place)
+    # of a few paths by watching their parent directories. Falls back to
+    # polling mtimes, so callers don't need a second code path.
+    def __init__(self, paths, poll_interval=POLL_INTERVAL):
+        self.paths = [os.path.abspath(path) for path in paths]
+        self.poll_interval = poll_interval
+        self.fd = None
+        self.watches = {}
+        self.mtimes = {path: self.mtime(path) for path in self.paths}
+        try:
+            self.start_inotify()
+        except OSError:
+            self.close()
+
+    def start_inotify(self):
+        libc = ctypes.CDLL(None, use_errno=True)
+        self.fd = libc.inotify_init1(os.O_CLOEXEC | os.O_NONBLOCK)
+        if self.fd < 0:
+            self.fd = None
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        by_dir = {}
+        for path in self.paths:
+            by_dir.setdefault(os.path.dirname(path), {})[os.path.basename(path)] = path
+        for directory, names in by_dir.items():
+            wd = libc.inotify_add_watch(self.fd, directory.encode(), IN_CLOSE_WRITE | IN_MOVED_TO)
+            if wd < 0:
+                raise OSError(ctypes.get_errno(), f"inotify_add_watch {directory} failed")
+            self.watches[wd] = names
+
+    def mtime(self, path):
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+    def read_events(self):
+        changed = set()
+        try:
+            data = os.read(self.fd, 4096)
+        except BlockingIOError:
+            return changed
+        offset = 0
+        while offset + IN_EVENT_HEADER.size <= len(data):
+            wd, mask, cookie, length = IN_EVENT_HEADER.unpack_from(data, offset)
+            offset += IN_EVENT_HEADER.size
+            name = data[offset:offset + length].split(b"\0", 1)[0].decode('utf-8', 'replace')
+            offset += length
+            path = self.watches.get(wd, {}).get(name)
+            if path:
+                changed.add(path)
+        return changed
+
+    def poll(self):
+        changed = set()
+        for path in self.paths:
+            mtime = self.mtime(path)
+            if mtime != self.mtimes.get(path) and mtime is not None:
+                changed.add(path)
+            self.mtimes[path] = mtime
+        return changed
+
+    def wait(self, timeout=None):
+        # Returns the set of paths that changed; empty if timeout ran out
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else max(0, deadline - time.monotonic())
+            if self.fd is not None:
+                ready, _, _ = select.select([self.fd], [], [], remaining)
+                changed = self.read_events() if ready else set()
+            else:
+                time.sleep(self.poll_interval if remaining is None else min(self.poll_interval, remaining))
+                changed = self.poll()
+            if changed or (deadline is not None and time.monotonic() >= deadline):
+                return changed
+
+    def close(self):
+        if self.fd is not None:
+            try: os.close(self.fd)
+            except: pass
+        self.fd = None
+        self.watches = {}
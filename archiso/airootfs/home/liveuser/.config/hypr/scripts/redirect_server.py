@@ -1,14 +1,45 @@
 #!/usr/bin/env python3
-import http.server
-import socketserver
+import asyncio
+import base64
+import bisect
+import collections
+import html
 import json
 import os
+import socket
 import ssl
+import sys
 import threading
+import time
+import weakref
+
+# ca_manager.py sits next to this script; without it every host gets server.pem
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from file_watch import FileWatch
+try:
+    import ca_manager
+except ImportError:
+    ca_manager = None
 
 HTTP_PORT = 80
 HTTPS_PORT = 443
 SESSION_FILE = "/tmp/sddm_session.json"
+RUN_DIR = "/run/hyprfocus"
+CONTROL_SOCKET = "/run/hyprfocus/redirect.sock"
+# Written once all listeners are up; session_manager.py treats it as readiness
+PID_FILE = "/run/hyprfocus/redirect.pid"
+SD_LISTEN_FDS_START = 3
+FOCUS_POLL_INTERVAL = 2  # only when inotify is unavailable
+REQUEST_TIMEOUT = 10
+KEEPALIVE_TIMEOUT = 15
+MAX_REQUESTS_PER_CONNECTION = 100
+MAX_BODY_DRAIN = 64 * 1024
+
+# Most blocked hits are ad scripts, pixels and XHRs, not page loads. They get
+# a zero-length 204 or a 1x1 GIF; only navigations get the full focus page.
+PIXEL_GIF = base64.b64decode("R0lGODlhAQABAIAAAAAAAP///yH5BAEAAAAALAAAAAABAAEAAAIBRAA7")
+IMAGE_EXTENSIONS = (".gif", ".png", ".jpg", ".jpeg", ".webp", ".avif", ".ico", ".bmp", ".svg")
+DOCUMENT_DESTS = ("document", "iframe", "frame")
 
 # Portable way to get the actual user's home even under sudo
 real_user = os.getenv("SUDO_USER") or os.getenv("USER")
@@ -17,26 +48,31 @@ if os.getuid() == 0 and os.getenv("SUDO_USER"):
 else:
     home_dir = os.path.expanduser("~")
 
+# The session user's runtime dir (we run as root via sudo)
+if os.getuid() == 0 and os.getenv("SUDO_UID"):
+    runtime_dir = f"/run/user/{os.getenv('SUDO_UID')}"
+else:
+    runtime_dir = os.getenv("XDG_RUNTIME_DIR") or f"/run/user/{os.getuid()}"
+# Current goal/intention as pushed by session_manager.py (survives our restarts).
+# Alone in its directory, so the watcher only wakes for it.
+FOCUS_FILE = os.path.join(runtime_dir, "hyprfocus", "focus", "focus.json")
+
 CERT_FILE = os.path.join(home_dir, ".config/hypr/scripts/certs/server.pem")
+# Goal filters ("filters": {goal: [domains]}), minted certs for at startup
+SETTINGS_FILE = os.path.join(home_dir, ".config/hypr/settings.json")
+# Per-host TLS contexts kept in memory (the PEM bundles are cached on disk by ca_manager)
+HOST_CONTEXT_CACHE_SIZE = 128
 
-class FocusHandler(http.server.SimpleHTTPRequestHandler):
-    def do_GET(self):
-        self.send_response(200)
-        self.send_header("Content-type", "text/html")
-        self.end_headers()
-        
-        goal = "Focus"
-        intention = "Stay on task"
-        
-        if os.path.exists(SESSION_FILE):
-            try:
-                with open(SESSION_FILE, 'r') as f:
-                    data = json.load(f)
-                    goal = data.get("goal", goal)
-                    intention = data.get("intention", intention)
-            except: pass
+# Block-hit statistics: served live on /__stats (localhost only) and appended
+# as one compact JSON line per interval with the hits since the previous line
+STATS_FILE = os.path.join(home_dir, ".config/hypr/block_stats.jsonl")
+STATS_PATH = "/__stats"
+STATS_FLUSH_INTERVAL = 60
+STATS_MAX_HOSTS = 2048
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 1000)  # plus one overflow bucket
+LOCAL_HOSTS = ("localhost", "127.0.0.1", "[::1]")
 
-        html = f"""
+PAGE_TEMPLATE = """
         <!DOCTYPE html>
         <html>
         <head>
@@ -81,46 +117,533 @@ class FocusHandler(http.server.SimpleHTTPRequestHandler):
         </body>
         </html>
         """
-        self.wfile.write(html.encode('utf-8'))
 
-    def log_message(self, format, *args):
-        return # Silence logs
+def ensure_focus_dir():
+    # Created here too when we start first, owned by the session user so
+    # session_manager.py can still write into it
+    directory = os.path.dirname(FOCUS_FILE)
+    for path in (os.path.dirname(directory), directory):
+        if os.path.isdir(path):
+            continue
+        try:
+            os.mkdir(path, 0o700)
+            if os.getenv("SUDO_UID"):
+                os.chown(path, int(os.getenv("SUDO_UID")), int(os.getenv("SUDO_GID", "-1")))
+        except OSError as e:
+            print(f"Failed to create {path}: {e}")
+            return
 
-def run_http():
+def read_focus_file(path):
+    # (goal, intention) from a session/focus JSON file, or None
     try:
-        class ThreadingSimpleServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
-            pass
-        with ThreadingSimpleServer(("0.0.0.0", HTTP_PORT), FocusHandler) as httpd:
-            print(f"Serving HTTP focus page on port {HTTP_PORT}")
-            httpd.serve_forever()
+        with open(path, 'r') as f:
+            data = json.load(f)
+        return data.get("goal"), data.get("intention")
+    except: return None
+
+class FocusState:
+    # Goal and intention shown on the page, held in memory. Only changed on the
+    # event loop thread; version bumps tell the page cache to re-render.
+    def __init__(self):
+        self.goal = "Focus"
+        self.intention = "Stay on task"
+        self.version = 0
+
+    def update(self, goal, intention):
+        goal = goal or self.goal
+        intention = intention or self.intention
+        if (goal, intention) != (self.goal, self.intention):
+            self.goal, self.intention = goal, intention
+            self.version += 1
+
+focus = FocusState()
+
+class FocusWatcher(threading.Thread):
+    # Watches FOCUS_FILE and hands new contents to the event loop. SESSION_FILE
+    # is only read at startup: session_manager.py pushes each login's goal.
+    def __init__(self, loop, paths=None):
+        super().__init__(daemon=True)
+        self.loop = loop
+        self.paths = paths or (FOCUS_FILE,)
+
+    def publish(self, path):
+        values = read_focus_file(path)
+        if values:
+            self.loop.call_soon_threadsafe(focus.update, *values)
+
+    def run(self):
+        watch = FileWatch(self.paths, poll_interval=FOCUS_POLL_INTERVAL)
+        while True:
+            for path in watch.wait():
+                self.publish(path)
+
+def make_response(status, headers, body, keep_alive):
+    lines = [f"HTTP/1.1 {status}"] + headers
+    if not status.startswith("204"):
+        lines.append(f"Content-Length: {len(body)}")  # not allowed on 204
+    lines += ["Cache-Control: no-store", "Connection: keep-alive" if keep_alive else "Connection: close"]
+    head = ("\r\n".join(lines) + "\r\n\r\n").encode('ascii')
+    return head + body, len(head)
+
+# Pre-encoded tiny responses, indexed by keep_alive
+EMPTY_RESPONSES = {k: make_response("204 No Content", [], b"", k) for k in (False, True)}
+PIXEL_RESPONSES = {k: make_response("200 OK", ["Content-Type: image/gif"], PIXEL_GIF, k) for k in (False, True)}
+
+class PageCache:
+    # Keeps the fully encoded response and only re-renders it when the
+    # in-memory focus state changes
+    def __init__(self):
+        self.version = None
+        self.responses = None
+
+    def get(self, keep_alive):
+        if self.responses is None or focus.version != self.version:
+            body = PAGE_TEMPLATE.format(goal=html.escape(str(focus.goal)), intention=html.escape(str(focus.intention))).encode('utf-8')
+            headers = ["Content-Type: text/html; charset=utf-8"]
+            self.responses = {k: make_response("200 OK", headers, body, k) for k in (False, True)}
+            self.version = focus.version
+        return self.responses[keep_alive]
+
+page_cache = PageCache()
+
+class HitStats:
+    # Per-host hit counters and latency histograms. Only touched from the event
+    # loop thread, so plain dicts and lists need no locking.
+    def __init__(self):
+        self.started = time.time()
+        self.hosts = {}    # host -> {"hits", "page", "pixel", "empty", "latency"}
+        self.pending = {}  # host -> hits since the last flush
+        self.pending_latency = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    def record(self, host, kind, elapsed):
+        if host not in self.hosts and len(self.hosts) >= STATS_MAX_HOSTS:
+            host = "(other)"
+        entry = self.hosts.get(host)
+        if entry is None:
+            entry = self.hosts[host] = {"hits": 0, "page": 0, "pixel": 0, "empty": 0,
+                                        "latency": [0] * (len(LATENCY_BUCKETS_MS) + 1)}
+        bucket = bisect.bisect_left(LATENCY_BUCKETS_MS, elapsed * 1000)
+        entry["hits"] += 1
+        entry[kind] += 1
+        entry["latency"][bucket] += 1
+        self.pending[host] = self.pending.get(host, 0) + 1
+        self.pending_latency[bucket] += 1
+
+    def snapshot(self):
+        total = sum(entry["hits"] for entry in self.hosts.values())
+        return {
+            "started": int(self.started),
+            "uptime": int(time.time() - self.started),
+            "total_hits": total,
+            "latency_buckets_ms": list(LATENCY_BUCKETS_MS),
+            "hosts": self.hosts,
+        }
+
+    def flush(self):
+        # Append the hits since the last flush; nothing is written when idle
+        if not self.pending:
+            return
+        line = json.dumps({"ts": int(time.time()), "hits": self.pending, "latency": self.pending_latency},
+                          separators=(',', ':'))
+        try:
+            fd = os.open(STATS_FILE, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, (line + "\n").encode('utf-8'))
+                if os.getenv("SUDO_UID"):
+                    os.fchown(fd, int(os.getenv("SUDO_UID")), -1)  # keep it readable by the user's apps
+            finally:
+                os.close(fd)
+        except OSError as e:
+            print(f"Failed to write stats: {e}")
+            return
+        self.pending = {}
+        self.pending_latency = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+stats = HitStats()
+
+def request_host(headers):
+    host = headers.get("host", "").lower()
+    if not host.startswith("["):
+        host = host.rsplit(":", 1)[0]
+    return host.rstrip('.') or "-"
+
+def is_stats_request(path, headers, peer):
+    # Only on localhost by name and from a loopback peer, so neither blocked
+    # sites nor other machines on the network can read it
+    if path.split("?", 1)[0] != STATS_PATH:
+        return False
+    peer_ip = peer[0] if peer else ""
+    return headers.get("host", "").lower().rsplit(":", 1)[0] in LOCAL_HOSTS and peer_ip in ("127.0.0.1", "::1")
+
+def stats_response(keep_alive):
+    body = json.dumps(stats.snapshot(), separators=(',', ':')).encode('utf-8')
+    return make_response("200 OK", ["Content-Type: application/json"], body, keep_alive)[0]
+
+def parse_request(head):
+    # Returns (method, path, version, headers) with lowercased header names
+    lines = head.decode('latin-1').split("\r\n")
+    parts = lines[0].split(" ")
+    method = parts[0]
+    path = parts[1] if len(parts) > 1 else "/"
+    version = parts[2] if len(parts) > 2 else "HTTP/1.0"
+    headers = {}
+    for line in lines[1:]:
+        name, sep, value = line.partition(":")
+        if sep:
+            headers[name.strip().lower()] = value.strip()
+    return method, path, version, headers
+
+def wants_keep_alive(version, headers):
+    connection = headers.get("connection", "").lower()
+    if version == "HTTP/1.1":
+        return "close" not in connection
+    return "keep-alive" in connection
+
+def classify(path, headers):
+    # "page" for navigations, "pixel" for images, "empty" for everything else
+    dest = headers.get("sec-fetch-dest", "").lower()
+    if dest:
+        if dest in DOCUMENT_DESTS:
+            return "page"
+        return "pixel" if dest == "image" else "empty"
+
+    accept = headers.get("accept", "").lower()
+    if "text/html" in accept:
+        return "page"
+    resource = path.split("?", 1)[0].lower()
+    if accept.startswith("image/") or resource.endswith(IMAGE_EXTENSIONS):
+        return "pixel"
+    return "empty"
+
+def select_response(method, path, headers, keep_alive):
+    kind = classify(path, headers)
+    if kind == "page":
+        response, head_len = page_cache.get(keep_alive)
+    elif kind == "pixel":
+        response, head_len = PIXEL_RESPONSES[keep_alive]
+    else:
+        response, head_len = EMPTY_RESPONSES[keep_alive]
+    if method == "HEAD":
+        response = response[:head_len]
+    return response, kind
+
+async def drain_body(reader, headers):
+    # Consume the request body so the next request on the connection parses
+    # cleanly. Returns False if the body can't be skipped (connection must close).
+    if "chunked" in headers.get("transfer-encoding", "").lower():
+        return False
+    try:
+        length = int(headers.get("content-length", "0"))
+    except ValueError:
+        return False
+    if length < 0 or length > MAX_BODY_DRAIN:
+        return False
+    if length > 0:
+        await asyncio.wait_for(reader.readexactly(length), REQUEST_TIMEOUT)
+    return True
+
+async def handle_client(reader, writer):
+    peer = writer.get_extra_info("peername")
+    try:
+        for served in range(MAX_REQUESTS_PER_CONNECTION):
+            timeout = REQUEST_TIMEOUT if served == 0 else KEEPALIVE_TIMEOUT
+            head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout)
+            method, path, version, headers = parse_request(head)
+
+            keep_alive = wants_keep_alive(version, headers) and served + 1 < MAX_REQUESTS_PER_CONNECTION
+            if not await drain_body(reader, headers):
+                keep_alive = False
+
+            if is_stats_request(path, headers, peer):
+                writer.write(stats_response(keep_alive))
+                await writer.drain()
+            else:
+                started = time.perf_counter()
+                response, kind = select_response(method, path, headers, keep_alive)
+                writer.write(response)
+                await writer.drain()
+                stats.record(request_host(headers), kind, time.perf_counter() - started)
+            if not keep_alive:
+                break
+    except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError, ssl.SSLError):
+        pass
+    finally:
+        writer.close()
+
+def inherited_sockets():
+    # systemd-style socket activation: pre-bound listeners passed as fds 3..
+    # Returns {"http": sock, "https": sock}, matched by LISTEN_FDNAMES or port.
+    if os.getenv("LISTEN_PID") != str(os.getpid()):
+        return {}
+    try:
+        count = int(os.getenv("LISTEN_FDS", "0"))
+    except ValueError:
+        return {}
+    names = os.getenv("LISTEN_FDNAMES", "").split(":")
+    sockets = {}
+    for index in range(count):
+        try:
+            sock = socket.socket(fileno=SD_LISTEN_FDS_START + index)
+        except OSError:
+            continue
+        name = names[index] if index < len(names) else ""
+        if name not in ("http", "https"):
+            address = sock.getsockname()
+            port = address[1] if isinstance(address, tuple) else None
+            name = "https" if port == HTTPS_PORT else "http" if port == HTTP_PORT else ""
+        if name:
+            sockets[name] = sock
+    for var in ("LISTEN_PID", "LISTEN_FDS", "LISTEN_FDNAMES"):
+        os.environ.pop(var, None)
+    return sockets
+
+async def start_http(sock=None):
+    try:
+        if sock is not None:
+            server = await asyncio.start_server(handle_client, sock=sock)
+        else:
+            server = await asyncio.start_server(handle_client, "0.0.0.0", HTTP_PORT)
+        print(f"Serving HTTP focus page on port {HTTP_PORT}")
+        return server
     except Exception as e:
         print(f"HTTP Server Error: {e}")
 
-def run_https():
+def new_tls_context(certfile):
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(certfile=certfile)
+    return context
+
+class HostCertStore:
+    # Picks a per-host certificate during the handshake via SNI: the bulk server
+    # cert chunk listing the host if there is one, else one minted for it.
+    # The callback runs on the event loop, so it only ever loads certs that are
+    # already on disk. A name without one is minted in the executor and gets
+    # server.pem until then. Contexts are kept in an LRU.
+    def __init__(self, size=HOST_CONTEXT_CACHE_SIZE):
+        self.size = size
+        self.contexts = collections.OrderedDict()
+        self.by_path = weakref.WeakValueDictionary()  # hosts in one chunk share a context
+        self.pending = set()
+        self.issue_lock = threading.Lock()  # one minting at a time (shared .tmp paths)
+
+    def context_for(self, hostname):
+        hostname = hostname.lower().rstrip('.')
+        context = self.contexts.get(hostname)
+        if context is not None:
+            self.contexts.move_to_end(hostname)
+            return context
+
+        path = None
+        if ca_manager:
+            path = ca_manager.find_server_cert(hostname) or ca_manager.existing_host_cert(hostname)
+            if not path:
+                self.issue_later(hostname)
+        if not path:
+            return None
+        try:
+            key = (path, os.stat(path).st_mtime_ns)  # reissued chunks get a fresh context
+            context = self.by_path.get(key)
+            if context is None:
+                context = new_tls_context(path)
+                self.by_path[key] = context
+        except (OSError, ssl.SSLError) as e:
+            print(f"Failed to load certificate for {hostname}: {e}")
+            return None
+        self.contexts[hostname] = context
+        while len(self.contexts) > self.size:
+            self.contexts.popitem(last=False)
+        return context
+
+    def issue(self, hostname):
+        with self.issue_lock:
+            return ca_manager.issue_host_cert(hostname)
+
+    def issue_later(self, hostname):
+        if hostname in self.pending:
+            return
+        self.pending.add(hostname)
+        future = asyncio.get_running_loop().run_in_executor(None, self.issue, hostname)
+        future.add_done_callback(lambda _: self.pending.discard(hostname))
+
+    def preissue(self, hostnames):
+        # Runs in the executor at startup so blocked sites have a cert before
+        # the first visit
+        minted = 0
+        for hostname in hostnames:
+            if ca_manager.find_server_cert(hostname) or ca_manager.existing_host_cert(hostname):
+                continue
+            if self.issue(hostname):
+                minted += 1
+        if minted:
+            print(f"Pre-issued {minted} host certificate(s)")
+
+    def sni_callback(self, ssl_object, server_name, listening_context):
+        if server_name:
+            context = self.context_for(server_name)
+            if context is not None:
+                ssl_object.context = context
+        return None  # continue the handshake; unknown names get server.pem
+
+def block_list_hosts():
+    # Every goal's filter domains, with the www. variant the hosts file blocks too
     try:
-        class ThreadingSimpleServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
-            pass
-        
-        httpd = ThreadingSimpleServer(("0.0.0.0", HTTPS_PORT), FocusHandler)
-        
-        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
-        context.load_cert_chain(certfile=CERT_FILE)
-        httpd.socket = context.wrap_socket(httpd.socket, server_side=True)
-        
+        with open(SETTINGS_FILE, 'r') as f:
+            filters = json.load(f).get("filters", {})
+    except:
+        return []
+    names = []
+    for domains in filters.values():
+        for domain in domains if isinstance(domains, list) else []:
+            if not isinstance(domain, str):
+                continue
+            domain = domain.strip().lower().rstrip('.')
+            if domain.startswith("*."):
+                domain = domain[2:]
+            bare = domain[4:] if domain.startswith("www.") else domain
+            if bare:
+                names.extend([bare, "www." + bare])
+    return list(dict.fromkeys(names))
+
+cert_store = HostCertStore()
+
+async def start_https(sock=None):
+    try:
+        context = new_tls_context(CERT_FILE)
+        context.sni_callback = cert_store.sni_callback
+
+        if sock is not None:
+            server = await asyncio.start_server(handle_client, sock=sock, ssl=context,
+                                                ssl_handshake_timeout=REQUEST_TIMEOUT)
+        else:
+            server = await asyncio.start_server(handle_client, "0.0.0.0", HTTPS_PORT, ssl=context,
+                                                ssl_handshake_timeout=REQUEST_TIMEOUT)
         print(f"Serving HTTPS focus page on port {HTTPS_PORT}")
-        httpd.serve_forever()
+        return server
     except Exception as e:
         print(f"HTTPS Server Error: {e}")
 
+async def flush_stats():
+    while True:
+        await asyncio.sleep(STATS_FLUSH_INTERVAL)
+        stats.flush()
+
+async def handle_control(reader, writer):
+    # One JSON line per update: {"goal": ..., "intention": ...} or {"op": "status"}
+    try:
+        while True:
+            line = await asyncio.wait_for(reader.readline(), KEEPALIVE_TIMEOUT)
+            if not line:
+                break
+            try:
+                data = json.loads(line)
+                if data.get("op") == "status":
+                    reply = {"ok": True, "pid": os.getpid(), "focus": [focus.goal, focus.intention]}
+                else:
+                    focus.update(data.get("goal"), data.get("intention"))
+                    reply = {"ok": True}
+            except (ValueError, AttributeError) as e:
+                reply = {"ok": False, "error": str(e)}
+            writer.write((json.dumps(reply) + "\n").encode())
+            await writer.drain()
+    except (asyncio.TimeoutError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+async def start_control():
+    try:
+        os.makedirs(RUN_DIR, exist_ok=True)
+        try:
+            os.remove(CONTROL_SOCKET)
+        except FileNotFoundError:
+            pass
+        # Only the user who started us (and root) may connect
+        old_umask = os.umask(0o077)
+        try:
+            server = await asyncio.start_unix_server(handle_control, CONTROL_SOCKET)
+        finally:
+            os.umask(old_umask)
+        if os.getenv("SUDO_UID"):
+            os.chown(CONTROL_SOCKET, int(os.getenv("SUDO_UID")), -1)
+        return server
+    except Exception as e:
+        print(f"Control Socket Error: {e}")
+
+def running_pid():
+    # PID of a live redirect server from PID_FILE, or None
+    try:
+        with open(PID_FILE, 'r') as f:
+            pid = int(f.read().strip())
+        with open(f"/proc/{pid}/cmdline", 'rb') as f:
+            return pid if b"redirect_server" in f.read() else None
+    except (OSError, ValueError):
+        return None
+
+def write_pid_file():
+    try:
+        os.makedirs(RUN_DIR, exist_ok=True)
+        with open(PID_FILE + ".tmp", 'w') as f:
+            f.write(f"{os.getpid()}\n")
+        os.replace(PID_FILE + ".tmp", PID_FILE)
+    except OSError as e:
+        print(f"Failed to write pid file: {e}")
+
+def notify_ready():
+    # sd_notify(READY=1) when started by a service manager
+    address = os.getenv("NOTIFY_SOCKET")
+    if not address:
+        return
+    if address.startswith("@"):
+        address = "\0" + address[1:]
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+            sock.sendto(b"READY=1", address)
+    except OSError:
+        pass
+
+async def main():
+    if running_pid() not in (None, os.getpid()):
+        print("Redirect server already running.")
+        return
+
+    # Start from whichever of the SDDM handoff and the last push is newer
+    existing = [path for path in (SESSION_FILE, FOCUS_FILE) if os.path.exists(path)]
+    for path in sorted(existing, key=lambda path: os.stat(path).st_mtime_ns):
+        values = read_focus_file(path)
+        if values:
+            focus.update(*values)
+    ensure_focus_dir()
+    FocusWatcher(asyncio.get_running_loop()).start()
+
+    if ca_manager:
+        ca_manager.key_pool.start()  # keys ready before the first unseen SNI name
+
+    # Bind (or adopt) every listener before announcing readiness
+    listeners = inherited_sockets()
+    servers = [await start_http(listeners.get("http")), await start_https(listeners.get("https"))]
+    servers = [server for server in servers if server is not None]
+    if not servers:
+        return  # ports taken; leave the running instance's socket and pidfile alone
+    if ca_manager:
+        asyncio.get_running_loop().run_in_executor(None, cert_store.preissue, block_list_hosts())
+    control = await start_control()
+    if control is not None:
+        servers.append(control)
+    write_pid_file()
+    notify_ready()
+    try:
+        await asyncio.gather(*(server.serve_forever() for server in servers), flush_stats())
+    finally:
+        stats.flush()
+        if running_pid() == os.getpid():
+            try: os.remove(PID_FILE)
+            except: pass
+
 if __name__ == "__main__":
     if not os.path.exists(CERT_FILE):
         print("Certificate not found. HTTPS will fail.")
-    
-    t1 = threading.Thread(target=run_http)
-    t2 = threading.Thread(target=run_https)
-    
-    t1.start()
-    t2.start()
-    
-    t1.join()
-    t2.join()
\ No newline at end of file
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,373 @@
+import atexit
+import fcntl
+import json
+import os
+import threading
+from datetime import date, datetime
+
+# Session event log shared by session_manager.py, shutdown_script.py and
+# settings_app.py. Events go to monthly segments (YYYY-MM.jsonl), each with a
+# sidecar index (YYYY-MM.idx.json) of per-day byte ranges and counts.
+LOG_DIR = os.path.expanduser("~/session_logs")
+LOCK_FILE = os.path.join(LOG_DIR, ".lock")
+# Single-file log used before segments; migrated on first use
+LEGACY_LOG_FILE = os.path.expanduser("~/session_logs.jsonl")
+INDEX_VERSION = 1
+# Dashboard aggregates, advanced from the segments' tails (see update_rollup)
+ROLLUP_FILE = os.path.join(LOG_DIR, "rollup.json")
+ROLLUP_VERSION = 1
+ROLLUP_RECENT = 10
+RECENT_TYPES = ("login", "feedback", "pomodoro_segment")
+# A login -> feedback gap longer than this isn't counted as focus time
+MAX_SESSION_HOURS = 24
+# Buffered events are written after this many seconds, or sooner when
+# BATCH_SIZE of them pile up
+FLUSH_DELAY = 1.0
+BATCH_SIZE = 32
+
+def entry_day(entry):
+    # "YYYY-MM-DD" of an event; very old entries used "date" instead of "timestamp"
+    stamp = entry.get("timestamp") or entry.get("date")
+    if not isinstance(stamp, str) or len(stamp) < 10:
+        return None
+    try:
+        date.fromisoformat(stamp[:10])
+    except ValueError:
+        return None
+    return stamp[:10]
+
+def segment_path(month):
+    return os.path.join(LOG_DIR, f"{month}.jsonl")
+
+def index_path(month):
+    return os.path.join(LOG_DIR, f"{month}.idx.json")
+
+def list_months():
+    try:
+        names = os.listdir(LOG_DIR)
+    except OSError:
+        return []
+    return sorted(name[:-6] for name in names if name.endswith(".jsonl") and len(name) == 13)
+
+class DirLock:
+    # flock on LOG_DIR/.lock so writers in different processes don't interleave
+    def __enter__(self):
+        os.makedirs(LOG_DIR, exist_ok=True)
+        self.fd = os.open(LOCK_FILE, os.O_RDWR | os.O_CREAT | os.O_CLOEXEC, 0o644)
+        fcntl.flock(self.fd, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        fcntl.flock(self.fd, fcntl.LOCK_UN)
+        os.close(self.fd)
+
+# --- Index ---
+
+def empty_index():
+    return {"version": INDEX_VERSION, "size": 0, "days": {}}
+
+def load_index(month):
+    try:
+        with open(index_path(month), 'r') as f:
+            index = json.load(f)
+        if index.get("version") == INDEX_VERSION:
+            return index
+    except:
+        pass
+    return empty_index()
+
+def save_index(month, index):
+    path = index_path(month)
+    tmp = path + ".tmp"
+    with open(tmp, 'w') as f:
+        json.dump(index, f)
+    os.replace(tmp, path)
+
+def index_entry(index, entry, start, end):
+    # Adds one record at bytes [start, end) of the segment to the day aggregates
+    day = entry_day(entry)
+    if day is None:
+        return
+    stats = index["days"].get(day)
+    if stats is None:
+        stats = index["days"][day] = {"offset": start, "end": end, "count": 0,
+                                      "types": {}, "rating_sum": 0, "ratings": 0}
+    stats["offset"] = min(stats["offset"], start)
+    stats["end"] = max(stats["end"], end)
+    stats["count"] += 1
+    kind = entry.get("type") or "unknown"
+    stats["types"][kind] = stats["types"].get(kind, 0) + 1
+    rating = entry.get("rating")
+    if isinstance(rating, (int, float)) and not isinstance(rating, bool):
+        stats["rating_sum"] += rating
+        stats["ratings"] += 1
+
+def read_tail(month, offset):
+    # Complete records of a segment from byte offset on, as
+    # ([(entry, start, end)], offset after the last complete line)
+    records = []
+    pos = offset
+    try:
+        with open(segment_path(month), 'rb') as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    entry = json.loads(line)
+                    if isinstance(entry, dict):
+                        records.append((entry, pos, pos + len(line)))
+                except ValueError:
+                    pass
+                pos += len(line)
+    except OSError:
+        pass
+    return records, pos
+
+def catch_up_index(month, index):
+    # Indexes whatever the segment has past index["size"] (a crash between the
+    # segment write and the index save, or a deleted index)
+    try:
+        size = os.path.getsize(segment_path(month))
+    except OSError:
+        return empty_index() if index["size"] else index
+    if size < index["size"]:
+        index = empty_index()
+    if size == index["size"]:
+        return index
+    records, index["size"] = read_tail(month, index["size"])
+    for entry, start, end in records:
+        index_entry(index, entry, start, end)
+    return index
+
+# --- Writing ---
+
+def write_entries(entries):
+    # Appends entries to their month segments, fsyncs, then updates the indexes.
+    # Caller holds DirLock.
+    by_month = {}
+    for entry in entries:
+        day = entry_day(entry)
+        if day:
+            by_month.setdefault(day[:7], []).append(entry)
+    for month, batch in sorted(by_month.items()):
+        index = catch_up_index(month, load_index(month))
+        lines = [(json.dumps(entry) + "\n").encode() for entry in batch]
+        fd = os.open(segment_path(month), os.O_WRONLY | os.O_APPEND | os.O_CREAT | os.O_CLOEXEC, 0o644)
+        try:
+            pos = os.fstat(fd).st_size
+            if pos != index["size"]:
+                # Partial line from an interrupted write; start on a fresh line
+                os.write(fd, b"\n")
+                pos += 1
+            os.write(fd, b"".join(lines))
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        for entry, line in zip(batch, lines):
+            index_entry(index, entry, pos, pos + len(line))
+            pos += len(line)
+        index["size"] = pos
+        save_index(month, index)
+
+def migrate_legacy():
+    # Moves ~/session_logs.jsonl into monthly segments once
+    if not os.path.exists(LEGACY_LOG_FILE):
+        return
+    try:
+        with DirLock():
+            if not os.path.exists(LEGACY_LOG_FILE):
+                return
+            entries = []
+            with open(LEGACY_LOG_FILE, 'r') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        if isinstance(entry, dict):
+                            entries.append(entry)
+                    except ValueError:
+                        continue
+            entries.sort(key=lambda e: entry_day(e) or "")
+            write_entries(entries)
+            os.replace(LEGACY_LOG_FILE, LEGACY_LOG_FILE + ".migrated")
+    except Exception as e:
+        print(f"Failed to migrate {LEGACY_LOG_FILE}: {e}")
+
+class EventLog:
+    # Buffers events and writes them in batches. A timer flushes FLUSH_DELAY
+    # after the first buffered event; call flush() before exiting on purpose.
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = []
+        self.timer = None
+        atexit.register(self.flush)
+
+    def append(self, entry):
+        with self.lock:
+            self.pending.append(entry)
+            if len(self.pending) >= BATCH_SIZE:
+                flush_now = True
+            else:
+                flush_now = False
+                if self.timer is None:
+                    self.timer = threading.Timer(FLUSH_DELAY, self.flush)
+                    self.timer.daemon = True
+                    self.timer.start()
+        if flush_now:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            entries, self.pending = self.pending, []
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+        if not entries:
+            return
+        migrate_legacy()
+        try:
+            with DirLock():
+                write_entries(entries)
+        except Exception as e:
+            print(f"Failed to log: {e}")
+
+event_log = EventLog()
+
+def log_event(entry):
+    if "timestamp" not in entry:
+        entry = dict(entry, timestamp=datetime.now().isoformat())
+    event_log.append(entry)
+
+def flush():
+    event_log.flush()
+
+# --- Reading ---
+
+def month_indexes(start=None, end=None):
+    # [(month, index)] for segments overlapping [start, end] (dates or None)
+    migrate_legacy()
+    first = start.isoformat()[:7] if start else None
+    last = end.isoformat()[:7] if end else None
+    result = []
+    for month in list_months():
+        if (first and month < first) or (last and month > last):
+            continue
+        result.append((month, catch_up_index(month, load_index(month))))
+    return result
+
+def read_events(start=None, end=None):
+    # Yields events dated within [start, end] (inclusive dates, None = open),
+    # oldest segment first, reading only the byte range the index points at
+    first = start.isoformat() if start else None
+    last = end.isoformat() if end else None
+    for month, index in month_indexes(start, end):
+        days = [stats for day, stats in index["days"].items()
+                if (not first or day >= first) and (not last or day <= last)]
+        if not days:
+            continue
+        begin = min(stats["offset"] for stats in days)
+        stop = max(stats["end"] for stats in days)
+        try:
+            with open(segment_path(month), 'rb') as f:
+                f.seek(begin)
+                data = f.read(stop - begin)
+        except OSError:
+            continue
+        for line in data.splitlines():
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            day = entry_day(entry) if isinstance(entry, dict) else None
+            if day and (not first or day >= first) and (not last or day <= last):
+                yield entry
+
+# --- Rollup ---
+
+def empty_rollup():
+    return {"version": ROLLUP_VERSION, "positions": {}, "session_start": None,
+            "days": {}, "rating_sum": 0, "ratings": 0, "recent": []}
+
+def load_rollup():
+    try:
+        with open(ROLLUP_FILE, 'r') as f:
+            rollup = json.load(f)
+        if rollup.get("version") == ROLLUP_VERSION:
+            return rollup
+    except:
+        pass
+    return empty_rollup()
+
+def save_rollup(rollup):
+    tmp = ROLLUP_FILE + ".tmp"
+    with open(tmp, 'w') as f:
+        json.dump(rollup, f)
+    os.replace(tmp, ROLLUP_FILE)
+
+def rollup_entry(rollup, entry):
+    # Same accounting the dashboard always did: a login opens a session, the
+    # next feedback closes it and its length counts towards the feedback's day
+    day = entry_day(entry)
+    if day is None:
+        return
+    try:
+        dt = datetime.fromisoformat(entry.get("timestamp") or entry.get("date"))
+    except:
+        return
+    kind = entry.get("type")
+    stats = rollup["days"].setdefault(day, {"focus_hours": 0, "sessions": 0, "rating_sum": 0, "ratings": 0})
+    if kind == "login":
+        rollup["session_start"] = dt.isoformat()
+        stats["sessions"] += 1
+    elif kind == "feedback":
+        if rollup["session_start"]:
+            hours = (dt - datetime.fromisoformat(rollup["session_start"])).total_seconds() / 3600
+            if 0 < hours < MAX_SESSION_HOURS:
+                stats["focus_hours"] += hours
+            rollup["session_start"] = None
+        rating = entry.get("rating")
+        if isinstance(rating, (int, float)) and not isinstance(rating, bool):
+            stats["rating_sum"] += rating
+            stats["ratings"] += 1
+            rollup["rating_sum"] += rating
+            rollup["ratings"] += 1
+    if kind in RECENT_TYPES:
+        rollup["recent"] = ([{"timestamp": dt.isoformat(), "type": kind,
+                              "goal": entry.get("goal"), "intention": entry.get("intention")}]
+                            + rollup["recent"])[:ROLLUP_RECENT]
+
+def update_rollup():
+    # Folds in records appended since the last checkpoint and saves the result.
+    # Only segments that grew are read, so this stays cheap however long the
+    # history is. Starts over if a segment shrank or went away.
+    migrate_legacy()
+    rollup = load_rollup()
+    months = list_months()
+    positions = rollup["positions"]
+    for month, offset in positions.items():
+        try:
+            size = os.path.getsize(segment_path(month))
+        except OSError:
+            size = -1
+        if size < offset:
+            rollup = empty_rollup()
+            positions = rollup["positions"]
+            break
+    changed = False
+    for month in months:
+        offset = positions.get(month, 0)
+        try:
+            if os.path.getsize(segment_path(month)) == offset:
+                continue
+        except OSError:
+            continue
+        records, positions[month] = read_tail(month, offset)
+        for entry, start, end in records:
+            rollup_entry(rollup, entry)
+        changed = True
+    if changed:
+        try:
+            save_rollup(rollup)
+        except Exception as e:
+            print(f"Failed to save {ROLLUP_FILE}: {e}")
+    return rollup
@@ -3,11 +3,12 @@ import os
 import json
 import subprocess
 import sys
-import time
 from datetime import datetime
 
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import session_log
+
 SETTINGS_FILE = os.path.expanduser("~/.config/hypr/settings.json")
-LOG_FILE = os.path.expanduser("~/session_logs.jsonl")
 SESSION_FILE = "/tmp/sddm_session.json"
 QML_PATH = os.path.expanduser("~/.config/hypr/scripts/SessionFeedback.qml")
 
@@ -38,11 +39,7 @@ def log_feedback(rating, comment, session_data):
         "rating": rating,
         "comment": comment
     }
-    try:
-        with open(LOG_FILE, 'a') as f:
-            f.write(json.dumps(log_entry) + "\n")
-    except Exception as e:
-        print(f"Failed to log: {e}")
+    session_log.log_event(log_entry)
 
 def run_feedback_gui(goal, intention):
     script_path = os.path.expanduser("~/.config/hypr/scripts/session_feedback.py")
@@ -86,7 +83,8 @@ def main():
             
             if rating is not None:
                 log_feedback(rating, comment, session)
-                time.sleep(0.5) # Ensure write completion
+                # Written and fsynced before poweroff
+                session_log.flush()
 
     # Proceed to shutdown
     print("Shutting down...")
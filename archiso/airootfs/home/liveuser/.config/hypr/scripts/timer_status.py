@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# Streams the session timer to waybar (custom/timer, "exec" without "interval").
+# Prints one JSON line when session_manager.py publishes a new phase and when
+# the remaining minutes tick over; sleeps in between.
+import os
+import sys
+import json
+import math
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from file_watch import FileWatch
+
+# Written by session_manager.py; alone in its directory so nothing else wakes us
+TIMER_STATE_FILE = os.path.join(os.getenv("XDG_RUNTIME_DIR") or f"/run/user/{os.getuid()}",
+                                "hyprfocus", "timer", "session_timer.json")
+PHASE_LABELS = {"work": " [WORK]", "session": ""}
+
+def read_state():
+    try:
+        with open(TIMER_STATE_FILE, 'r') as f:
+            return json.load(f)
+    except:
+        return None
+
+def render(state, now):
+    # Returns (waybar output, seconds until the text next changes or None)
+    if not state or state.get("phase") in (None, "idle"):
+        return {"text": ""}, None
+    phase = state["phase"]
+    if phase == "break":
+        return {"text": "BREAK", "class": "break"}, None
+
+    remaining = max(0, (state.get("end") or now) - now)
+    mins = math.ceil(remaining / 60)
+    text = f"{mins}m{PHASE_LABELS.get(phase, '')}"
+    # Next change is when the remaining time drops to the previous whole minute
+    next_change = remaining - (mins - 1) * 60 if mins > 0 else None
+    return {"text": text, "class": phase}, next_change
+
+def main():
+    # Waybar may start before session_manager.py; watch the directory from the start
+    try:
+        os.makedirs(os.path.dirname(TIMER_STATE_FILE), exist_ok=True)
+    except OSError:
+        pass
+    watch = FileWatch([TIMER_STATE_FILE])
+    state = read_state()
+    last = None
+    while True:
+        output, next_change = render(state, time.time())
+        line = json.dumps(output)
+        if line != last:
+            print(line, flush=True)
+            last = line
+        # Small margin so we wake just after the boundary, not just before it
+        timeout = None if next_change is None else next_change + 0.05
+        if watch.wait(timeout):
+            state = read_state()
+
+if __name__ == "__main__":
+    try:
+        main()
+    except (KeyboardInterrupt, BrokenPipeError):
+        pass
@@ -15,10 +15,13 @@ if [ -n "$NEW_USER" ]; then
         # Copy everything to /usr/local/bin and /usr/share
         cp -r "$USER_HOME/.sddm-theme-transfer/." /usr/share/sddm/themes/simple/
         cp "$USER_HOME/.sddm-theme-transfer/hosts_manager.py" /usr/local/bin/
+        cp "$USER_HOME/.sddm-theme-transfer/hosts_client.py" /usr/local/bin/
+        cp "$USER_HOME/.sddm-theme-transfer/file_watch.py" /usr/local/bin/
         cp "$USER_HOME/.sddm-theme-transfer/redirect_server.py" /usr/local/bin/
         cp "$USER_HOME/.sddm-theme-transfer/ca_manager.py" /usr/local/bin/
+        cp "$USER_HOME/.sddm-theme-transfer/dns_sinkhole.py" /usr/local/bin/
         
-        chmod +x /usr/local/bin/hosts_manager.py /usr/local/bin/redirect_server.py /usr/local/bin/ca_manager.py
+        chmod +x /usr/local/bin/hosts_manager.py /usr/local/bin/redirect_server.py /usr/local/bin/ca_manager.py /usr/local/bin/dns_sinkhole.py
     fi
 fi
 
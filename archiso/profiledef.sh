@@ -42,6 +42,8 @@ file_permissions=(
   ["/etc/sudoers.d/flow-arch-hosts"]="0:0:440"
   ["/usr/local/bin/hosts_manager.py"]="0:0:755"
   ["/usr/local/bin/redirect_server.py"]="0:0:755"
+  ["/usr/local/bin/ca_manager.py"]="0:0:755"
+  ["/usr/local/bin/dns_sinkhole.py"]="0:0:755"
   ["/etc/calamares/modules/shellprocess-final.conf"]="0:0:644"
   ["/usr/local/bin/flow-arch-finalize.sh"]="0:0:755"
   ["/etc/systemd/system/fix-liveuser-perms.service"]="0:0:644"
@@ -62,6 +64,7 @@ file_permissions=(
   ["/etc/skel/.config/hypr/scripts/custom_clock.sh"]="0:0:755"
   ["/etc/skel/.config/hypr/scripts/cycle_themes.sh"]="0:0:755"
   ["/etc/skel/.config/hypr/scripts/default_browser.sh"]="0:0:755"
+  ["/etc/skel/.config/hypr/scripts/dns_sinkhole.py"]="0:0:755"
   ["/etc/skel/.config/hypr/scripts/gammastep_control.sh"]="0:0:755"
   ["/etc/skel/.config/hypr/scripts/gammastep.sh"]="0:0:755"
   ["/etc/skel/.config/hypr/scripts/generate_pattern.py"]="0:0:755"
@@ -76,6 +79,7 @@ file_permissions=(
   ["/etc/skel/.config/hypr/scripts/setup_focus_ca.sh"]="0:0:755"
   ["/etc/skel/.config/hypr/scripts/shutdown_script.py"]="0:0:755"
   ["/etc/skel/.config/hypr/scripts/switch_theme.sh"]="0:0:755"
+  ["/etc/skel/.config/hypr/scripts/timer_status.py"]="0:0:755"
   ["/etc/skel/.config/hypr/scripts/update_waybar_css.py"]="0:0:755"
   ["/etc/skel/.config/hypr/scripts/waybar_wrapper.sh"]="0:0:755"
   ["/home/liveuser/.config/hypr/scripts"]="1000:1000:755"
@@ -92,6 +96,7 @@ file_permissions=(
   ["/home/liveuser/.config/hypr/scripts/custom_clock.sh"]="1000:1000:755"
   ["/home/liveuser/.config/hypr/scripts/cycle_themes.sh"]="1000:1000:755"
   ["/home/liveuser/.config/hypr/scripts/default_browser.sh"]="1000:1000:755"
+  ["/home/liveuser/.config/hypr/scripts/dns_sinkhole.py"]="1000:1000:755"
   ["/home/liveuser/.config/hypr/scripts/gammastep_control.sh"]="1000:1000:755"
   ["/home/liveuser/.config/hypr/scripts/gammastep.sh"]="1000:1000:755"
   ["/home/liveuser/.config/hypr/scripts/generate_pattern.py"]="1000:1000:755"
@@ -106,6 +111,7 @@ file_permissions=(
   ["/home/liveuser/.config/hypr/scripts/setup_focus_ca.sh"]="1000:1000:755"
   ["/home/liveuser/.config/hypr/scripts/shutdown_script.py"]="1000:1000:755"
   ["/home/liveuser/.config/hypr/scripts/switch_theme.sh"]="1000:1000:755"
+  ["/home/liveuser/.config/hypr/scripts/timer_status.py"]="1000:1000:755"
   ["/home/liveuser/.config/hypr/scripts/update_waybar_css.py"]="1000:1000:755"
   ["/home/liveuser/.config/hypr/scripts/waybar_wrapper.sh"]="1000:1000:755"
 )